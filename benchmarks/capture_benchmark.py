@@ -0,0 +1,134 @@
+# Capture Benchmark - screenshot vs CDP screencast
+# Measures frames/sec delivered and CPU seconds per session for each capture mode.
+#
+# Usage:
+#   python -m benchmarks.capture_benchmark --duration 20
+#   python -m benchmarks.capture_benchmark --url https://example.com --modes screencast
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.browser_manager import BrowserManager
+
+# Continuously repainting page so the screencast has something to stream
+ANIMATED_PAGE = """
+<html><body style="margin:0;font-family:sans-serif">
+<h1 style="padding:24px">Capture benchmark</h1>
+<div id="box" style="width:120px;height:120px;background:#3b82f6;margin:24px"></div>
+<script>
+let t = 0;
+setInterval(() => {
+    t += 1;
+    document.getElementById('box').style.transform = `translateX(${(t * 7) % 600}px)`;
+}, 33);
+</script>
+</body></html>
+"""
+
+def process_tree_cpu_seconds(root_pid):
+    """
+    Sum user+system CPU time of a process and all its descendants (Linux /proc).
+    Includes the Playwright driver and every Chromium child process.
+    """
+    ticks = os.sysconf("SC_CLK_TCK")
+    parents = {}
+    cpu = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                stat = f.read()
+        except OSError:
+            continue
+        # Fields after the "(comm)" part; ppid is the 2nd, utime/stime the 12th/13th
+        fields = stat[stat.rindex(")") + 2:].split()
+        pid = int(entry)
+        parents[pid] = int(fields[1])
+        cpu[pid] = (int(fields[11]) + int(fields[12])) / ticks
+
+    total = 0.0
+    for pid in cpu:
+        current = pid
+        while current and current != root_pid:
+            current = parents.get(current)
+        if current == root_pid:
+            total += cpu[pid]
+    return total
+
+async def run_mode(mode, url, duration, poll_interval):
+    manager = BrowserManager(capture_mode=mode)
+    await manager.start_browser()
+    try:
+        if url:
+            await manager.navigate(url)
+        else:
+            await manager.page.set_content(ANIMATED_PAGE)
+        await asyncio.sleep(1)  # Let the first paint / screencast frame land
+
+        root_pid = os.getpid()
+        cpu_start = process_tree_cpu_seconds(root_pid)
+        start = time.perf_counter()
+        reads = 0
+        distinct = 0
+        last_frame = None
+        frame_ready = asyncio.Event()
+        if manager.screencast:
+            manager.screencast.set_on_frame(frame_ready.set)
+
+        while time.perf_counter() - start < duration:
+            if manager.screencast and not poll_interval:
+                # Wake on each pushed frame instead of spinning on the cached one
+                try:
+                    await asyncio.wait_for(frame_ready.wait(), timeout=1)
+                except asyncio.TimeoutError:
+                    pass
+                frame_ready.clear()
+            frame = await manager.get_screenshot()
+            reads += 1
+            if frame is not None and frame is not last_frame and frame != last_frame:
+                distinct += 1
+                last_frame = frame
+            # Always yield: screencast frames and their acks are handled on this loop
+            await asyncio.sleep(poll_interval)
+
+        elapsed = time.perf_counter() - start
+        cpu_used = process_tree_cpu_seconds(root_pid) - cpu_start
+        return {
+            "mode": mode,
+            "reads_per_sec": reads / elapsed,
+            "frames_per_sec": distinct / elapsed,
+            "cpu_seconds": cpu_used,
+            "cpu_percent": 100.0 * cpu_used / elapsed,
+            "cpu_ms_per_frame": 1000.0 * cpu_used / distinct if distinct else 0.0
+        }
+    finally:
+        await manager.close()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare screenshot and screencast capture modes")
+    parser.add_argument("--url", help="Page to capture (defaults to a built-in animated page)")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds per mode")
+    parser.add_argument("--poll-interval", type=float, default=0.0,
+                        help="Sleep between reads; 0 reads as fast as possible (screencast: once per pushed frame)")
+    parser.add_argument("--modes", nargs="+", default=list(BrowserManager.CAPTURE_MODES))
+    args = parser.parse_args()
+
+    results = []
+    for mode in args.modes:
+        print(f"Benchmarking {mode} for {args.duration:.0f}s...")
+        results.append(await run_mode(mode, args.url, args.duration, args.poll_interval))
+
+    print()
+    print(f"{'mode':<12}{'reads/s':>10}{'frames/s':>10}{'cpu %':>10}{'cpu ms/frame':>14}")
+    for r in results:
+        print(f"{r['mode']:<12}{r['reads_per_sec']:>10.1f}{r['frames_per_sec']:>10.1f}"
+              f"{r['cpu_percent']:>10.1f}{r['cpu_ms_per_frame']:>14.1f}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
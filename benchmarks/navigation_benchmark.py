@@ -0,0 +1,62 @@
+# Navigation Benchmark - network policy + shared asset cache vs plain browsing
+# Visits the same URLs with and without request interception and reports the deltas.
+#
+# Usage:
+#   python -m benchmarks.navigation_benchmark https://example.com https://example.org --rounds 3
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.browser_manager import BrowserManager
+from services.network_policy import NetworkPolicy, NetworkInterceptor, HttpCache
+
+async def run(urls, rounds, interceptor_factory):
+    """Each round is a fresh session (new browser + context), like a new buyer."""
+    timings = []
+    stats = []
+    for _ in range(rounds):
+        network = interceptor_factory() if interceptor_factory else None
+        manager = BrowserManager(headless=True, network=network)
+        await manager.start_browser()
+        try:
+            for url in urls:
+                await manager.navigate(url)
+            timings.extend(manager.navigation_ms)
+            stats.append(manager.get_navigation_stats())
+        finally:
+            await manager.close()
+    return timings, stats
+
+async def main():
+    parser = argparse.ArgumentParser(description="Measure the effect of the network policy on navigation")
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--rounds", type=int, default=3, help="Fresh sessions per variant")
+    args = parser.parse_args()
+
+    baseline, _ = await run(args.urls, args.rounds, None)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = HttpCache(cache_dir, 256 * 1024 * 1024)
+        policy = NetworkPolicy()
+        filtered, filtered_stats = await run(args.urls, args.rounds, lambda: NetworkInterceptor(policy, cache))
+
+    avg_baseline = sum(baseline) / len(baseline)
+    avg_filtered = sum(filtered) / len(filtered)
+    blocked = sum(s["blocked"] for s in filtered_stats)
+    saved = sum(s["bytes_saved"] for s in filtered_stats)
+    hits = sum(s["cache_hits"] for s in filtered_stats)
+
+    print()
+    print(f"Plain navigation:     {avg_baseline:8.0f} ms avg over {len(baseline)} loads")
+    print(f"With network policy:  {avg_filtered:8.0f} ms avg over {len(filtered)} loads")
+    print(f"Delta:                {avg_filtered - avg_baseline:+8.0f} ms ({(avg_filtered / avg_baseline - 1) * 100:+.1f}%)")
+    print(f"Requests blocked:     {blocked}")
+    print(f"Asset cache hits:     {hits} ({saved / 1024:.0f} KiB served from disk)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -16,6 +16,60 @@ class Config:
             print("ERROR: Missing Azure OpenAI configuration in .env file.")
             sys.exit(1)
 
+        # Realtime: reconnect backoff cap (seconds) and pre-connected sockets (0 disables the pool)
+        self.REALTIME_RECONNECT_MAX_DELAY = float(os.getenv("REALTIME_RECONNECT_MAX_DELAY", "30"))
+        self.REALTIME_POOL_SIZE = int(os.getenv("REALTIME_POOL_SIZE", "0"))
+        # Realtime: transcribes buyer speech for the reconnect summary (empty disables it)
+        self.REALTIME_TRANSCRIPTION_MODEL = os.getenv("REALTIME_TRANSCRIPTION_MODEL", "whisper-1")
+        
+        # Audio: drop silent microphone audio before it is uploaded
+        self.AUDIO_VAD_ENABLED = os.getenv("AUDIO_VAD_ENABLED", "true").lower() == "true"
+
+        # Vision: fraction of fingerprint cells that must change before a frame is re-sent
+        self.VISION_CHANGE_THRESHOLD = float(os.getenv("VISION_CHANGE_THRESHOLD", "0"))
+        
+        # Vision: adaptive capture interval bounds (seconds)
+        self.CAPTURE_MIN_INTERVAL = float(os.getenv("CAPTURE_MIN_INTERVAL", "0.25"))
+        self.CAPTURE_MAX_INTERVAL = float(os.getenv("CAPTURE_MAX_INTERVAL", "8.0"))
+        
+        # Browser capture backend: "screenshot" or "screencast" (CDP)
+        self.CAPTURE_MODE = os.getenv("CAPTURE_MODE", "screenshot")
+        self.CAPTURE_QUALITY = int(os.getenv("CAPTURE_QUALITY", "80"))
+        
+        # Per-consumer encode profiles; encoding runs on a thread pool off the event loop
+        self.VISION_MAX_WIDTH = int(os.getenv("VISION_MAX_WIDTH", "1024"))
+        self.VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "50"))
+        self.VIEWER_MAX_WIDTH = int(os.getenv("VIEWER_MAX_WIDTH", "0")) or None
+        self.VIEWER_JPEG_QUALITY = int(os.getenv("VIEWER_JPEG_QUALITY", "80"))
+        self.ENCODE_WORKERS = int(os.getenv("ENCODE_WORKERS", "2"))
+        
+        # Vision: screenshots kept in the Realtime conversation; older ones are deleted
+        self.VISION_MAX_CONTEXT_IMAGES = int(os.getenv("VISION_MAX_CONTEXT_IMAGES", "3"))
+        self.VISION_EVICTION_SUMMARY = os.getenv("VISION_EVICTION_SUMMARY", "true").lower() == "true"
+        
+        # Vision: crawler screenshot analyses cached by perceptual hash (0 disables the cache)
+        self.VISION_CACHE_PATH = os.getenv("VISION_CACHE_PATH", ".vision_cache/analyses.db")
+        self.VISION_CACHE_MAX_MB = int(os.getenv("VISION_CACHE_MAX_MB", "64"))
+        self.VISION_CACHE_MAX_DISTANCE = int(os.getenv("VISION_CACHE_MAX_DISTANCE", "8"))
+        
+        # Browser: warm pool of Chromium processes shared by sessions (0 disables the pool)
+        self.BROWSER_HEADLESS = os.getenv("BROWSER_HEADLESS", "false").lower() == "true"
+        self.BROWSER_POOL_SIZE = int(os.getenv("BROWSER_POOL_SIZE", "0"))
+        self.BROWSER_MAX_CONTEXTS = int(os.getenv("BROWSER_MAX_CONTEXTS", "4"))
+        self.BROWSER_RECYCLE_AFTER = int(os.getenv("BROWSER_RECYCLE_AFTER", "50"))
+        
+        # Browser: per-product login snapshots reused by live sessions
+        self.STORAGE_STATE_DIR = os.getenv("STORAGE_STATE_DIR", ".storage_state")
+        self.STORAGE_STATE_TTL = int(os.getenv("STORAGE_STATE_TTL", str(12 * 3600)))
+        
+        # Browser: tracker blocking and shared static-asset cache
+        self.NETWORK_POLICY_ENABLED = os.getenv("NETWORK_POLICY_ENABLED", "true").lower() == "true"
+        self.HTTP_CACHE_DIR = os.getenv("HTTP_CACHE_DIR", ".http_cache")
+        self.HTTP_CACHE_MAX_MB = int(os.getenv("HTTP_CACHE_MAX_MB", "512"))
+        
+        # Browser: preload the next demo_script page in a hidden tab
+        self.PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+
     def load_env_file(self):
         env_file = f".env.{self.APP_ENV}"
         if os.path.exists(env_file):
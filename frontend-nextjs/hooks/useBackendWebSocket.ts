@@ -3,12 +3,35 @@
 import { useEffect, useRef } from 'react';
 import { useAgentStore } from './useAzureSonik';
 
+// Binary frame protocol (see services/frame_protocol.py)
+const FRAME_PROTOCOL_VERSION = 1;
+const FRAME_HEADER_SIZE = 16;
+const FRAME_TYPE_VIDEO = 1;
+const FRAME_TYPE_TILES = 2;
+const FRAME_TYPE_AUDIO_INPUT = 3;
+const FRAME_TYPE_AUDIO_OUTPUT = 4;
+const MODEL_SAMPLE_RATE = 24000;
+
+const encodeFrame = (type: number, seq: number, payload: ArrayBuffer) => {
+    const buffer = new ArrayBuffer(FRAME_HEADER_SIZE + payload.byteLength);
+    const view = new DataView(buffer);
+    view.setUint8(0, FRAME_PROTOCOL_VERSION);
+    view.setUint8(1, type);
+    view.setUint16(2, 0);
+    view.setUint32(4, seq >>> 0);
+    view.setBigUint64(8, BigInt(Date.now()));
+    new Uint8Array(buffer, FRAME_HEADER_SIZE).set(new Uint8Array(payload));
+    return buffer;
+};
+
 export function useBackendWebSocket() {
     const wsRef = useRef<WebSocket | null>(null);
     const { status, actions } = useAgentStore();
     const reconnectTimeoutRef = useRef<NodeJS.Timeout>();
     const canvasRef = useRef<HTMLCanvasElement | null>(null);
     const streamRef = useRef<MediaStream | null>(null);
+    const audioContextRef = useRef<AudioContext | null>(null);
+    const micStreamRef = useRef<MediaStream | null>(null);
 
     useEffect(() => {
         // Create hidden canvas for rendering frames
@@ -26,41 +49,182 @@ export function useBackendWebSocket() {
                 const ws = new WebSocket('ws://localhost:8080');
                 wsRef.current = ws;
 
-                ws.onopen = () => {
+                ws.binaryType = 'arraybuffer';
+
+                // Model speech is scheduled back to back on the audio clock
+                let nextPlayTime = 0;
+                const playingSources = new Set<AudioBufferSourceNode>();
+
+                const playAudio = (payload: ArrayBuffer) => {
+                    const audioContext = audioContextRef.current;
+                    if (!audioContext) return;
+                    const pcm = new Int16Array(payload);
+                    const audioBuffer = audioContext.createBuffer(1, pcm.length, MODEL_SAMPLE_RATE);
+                    const channel = audioBuffer.getChannelData(0);
+                    for (let i = 0; i < pcm.length; i++) channel[i] = pcm[i] / 32768;
+
+                    const source = audioContext.createBufferSource();
+                    source.buffer = audioBuffer;
+                    source.connect(audioContext.destination);
+                    nextPlayTime = Math.max(nextPlayTime, audioContext.currentTime);
+                    source.start(nextPlayTime);
+                    nextPlayTime += audioBuffer.duration;
+                    playingSources.add(source);
+                    source.onended = () => playingSources.delete(source);
+                };
+
+                const flushAudio = () => {
+                    playingSources.forEach(source => source.stop());
+                    playingSources.clear();
+                    nextPlayTime = 0;
+                };
+
+                const startMicrophone = async () => {
+                    const audioContext = new AudioContext();
+                    audioContextRef.current = audioContext;
+                    const micStream = await navigator.mediaDevices.getUserMedia({
+                        audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true }
+                    });
+                    micStreamRef.current = micStream;
+
+                    // PCM16 at the context's native rate; the server resamples to 24 kHz
+                    const source = audioContext.createMediaStreamSource(micStream);
+                    const processor = audioContext.createScriptProcessor(2048, 1, 1);
+                    let seq = 0;
+                    processor.onaudioprocess = (event) => {
+                        if (ws.readyState !== WebSocket.OPEN) return;
+                        const input = event.inputBuffer.getChannelData(0);
+                        const pcm = new Int16Array(input.length);
+                        for (let i = 0; i < input.length; i++) {
+                            const sample = Math.max(-1, Math.min(1, input[i]));
+                            pcm[i] = sample < 0 ? sample * 0x8000 : sample * 0x7fff;
+                        }
+                        ws.send(encodeFrame(FRAME_TYPE_AUDIO_INPUT, seq++, pcm.buffer));
+                    };
+                    // Open the server's audio path before the first PCM frame goes out
+                    ws.send(JSON.stringify({ type: 'audio_start', sample_rate: audioContext.sampleRate }));
+                    source.connect(processor);
+                    processor.connect(audioContext.destination);
+                };
+
+                ws.onopen = async () => {
                     console.log('✅ Connected to backend WebSocket');
+                    // Negotiate video right away: raw JPEG frames and dirty-region tiles instead of base64-in-JSON.
+                    // Audio follows separately so the microphone permission prompt never holds up video.
+                    ws.send(JSON.stringify({
+                        type: 'hello',
+                        binary_frames: true,
+                        tiles: true
+                    }));
+                    try {
+                        await startMicrophone();
+                    } catch (error) {
+                        console.error('Microphone unavailable, continuing without audio:', error);
+                    }
+                };
+
+                const drawFrame = (image: CanvasImageSource, width: number, height: number) => {
+                    const canvas = canvasRef.current;
+                    if (!canvas) return;
+
+                    const ctx = canvas.getContext('2d');
+                    if (!ctx) return;
+
+                    // Draw image to canvas
+                    if (canvas.width !== width || canvas.height !== height) {
+                        canvas.width = width;
+                        canvas.height = height;
+                    }
+                    ctx.drawImage(image, 0, 0);
+
+                    // Create MediaStream from canvas if not exists
+                    if (!streamRef.current) {
+                        const stream = canvas.captureStream(30); // 30 FPS
+                        streamRef.current = stream;
+                        actions.setVideoStream(stream);
+                        console.log('🎥 Video stream created and set!');
+                    }
+                };
+
+                // Tile updates only make sense on top of the keyframe they were diffed against
+                let hasKeyframe = false;
+                // Decodes are async; chain them so tiles never land before their keyframe
+                let renderChain: Promise<void> = Promise.resolve();
+
+                const drawTiles = async (payload: ArrayBuffer) => {
+                    if (!hasKeyframe) {
+                        ws.send(JSON.stringify({ type: 'keyframe_request' }));
+                        return;
+                    }
+                    const ctx = canvasRef.current?.getContext('2d');
+                    if (!ctx) return;
+
+                    // | width u16 | height u16 | count u16 | then per tile: x, y, w, h u16 | length u32 | jpeg |
+                    const view = new DataView(payload);
+                    const count = view.getUint16(4);
+                    let offset = 6;
+                    const tiles = [];
+                    for (let i = 0; i < count; i++) {
+                        const x = view.getUint16(offset);
+                        const y = view.getUint16(offset + 2);
+                        const length = view.getUint32(offset + 8);
+                        offset += 12;
+                        const blob = new Blob([payload.slice(offset, offset + length)], { type: 'image/jpeg' });
+                        tiles.push(createImageBitmap(blob).then(bitmap => ({ x, y, bitmap })));
+                        offset += length;
+                    }
+                    for (const { x, y, bitmap } of await Promise.all(tiles)) {
+                        ctx.drawImage(bitmap, x, y);
+                        bitmap.close();
+                    }
+                };
+
+                const handleBinaryFrame = async (buffer: ArrayBuffer) => {
+                    // Binary frame: | version u8 | type u8 | flags u16 | seq u32 | timestamp_ms u64 | payload |
+                    const view = new DataView(buffer);
+                    if (buffer.byteLength < FRAME_HEADER_SIZE || view.getUint8(0) !== FRAME_PROTOCOL_VERSION) return;
+
+                    const type = view.getUint8(1);
+                    const payload = buffer.slice(FRAME_HEADER_SIZE);
+
+                    if (type === FRAME_TYPE_VIDEO) {
+                        const bitmap = await createImageBitmap(new Blob([payload], { type: 'image/jpeg' }));
+                        drawFrame(bitmap, bitmap.width, bitmap.height);
+                        bitmap.close();
+                        hasKeyframe = true;
+                    } else if (type === FRAME_TYPE_TILES) {
+                        await drawTiles(payload);
+                    }
                 };
 
                 ws.onmessage = (event) => {
+                    if (event.data instanceof ArrayBuffer) {
+                        const buffer = event.data;
+                        if (buffer.byteLength >= FRAME_HEADER_SIZE && new DataView(buffer).getUint8(1) === FRAME_TYPE_AUDIO_OUTPUT) {
+                            // Audio must not wait behind video decodes
+                            playAudio(buffer.slice(FRAME_HEADER_SIZE));
+                            return;
+                        }
+                        renderChain = renderChain
+                            .then(() => handleBinaryFrame(buffer))
+                            .catch(error => console.error('Error decoding binary frame:', error));
+                        return;
+                    }
+
                     try {
                         const data = JSON.parse(event.data);
 
                         if (data.type === 'video_frame') {
-                            // Decode base64 and render to canvas
+                            // Legacy path: decode base64 and render to canvas
                             const base64Data = data.data;
                             const img = new Image();
 
-                            img.onload = () => {
-                                const canvas = canvasRef.current;
-                                if (!canvas) return;
-
-                                const ctx = canvas.getContext('2d');
-                                if (!ctx) return;
-
-                                // Draw image to canvas
-                                canvas.width = img.width;
-                                canvas.height = img.height;
-                                ctx.drawImage(img, 0, 0);
-
-                                // Create MediaStream from canvas if not exists
-                                if (!streamRef.current) {
-                                    const stream = canvas.captureStream(30); // 30 FPS
-                                    streamRef.current = stream;
-                                    actions.setVideoStream(stream);
-                                    console.log('🎥 Video stream created and set!');
-                                }
-                            };
+                            img.onload = () => drawFrame(img, img.width, img.height);
 
                             img.src = 'data:image/jpeg;base64,' + base64Data;
+                        } else if (data.type === 'audio_flush') {
+                            // Buyer interrupted: drop the model's queued speech
+                            flushAudio();
                         }
                     } catch (error) {
                         console.error('Error parsing WebSocket message:', error);
@@ -76,6 +240,11 @@ export function useBackendWebSocket() {
                     // Clear video stream
                     streamRef.current = null;
                     actions.setVideoStream(null);
+                    // A reconnect opens a fresh microphone pipeline
+                    micStreamRef.current?.getTracks().forEach(track => track.stop());
+                    micStreamRef.current = null;
+                    audioContextRef.current?.close();
+                    audioContextRef.current = null;
 
                     // Attempt to reconnect after 3 seconds
                     reconnectTimeoutRef.current = setTimeout(() => {
@@ -102,6 +271,14 @@ export function useBackendWebSocket() {
             if (streamRef.current) {
                 streamRef.current.getTracks().forEach(track => track.stop());
             }
+            if (micStreamRef.current) {
+                micStreamRef.current.getTracks().forEach(track => track.stop());
+                micStreamRef.current = null;
+            }
+            if (audioContextRef.current) {
+                audioContextRef.current.close();
+                audioContextRef.current = null;
+            }
         };
     }, [status, actions]);
 
@@ -1,46 +1,154 @@
 import json
+import time
 import asyncio
+from config import config
 from services.realtime_client import RealtimeClient
 from services.browser_manager import BrowserManager
 from services.video_stream import VideoStream
+from services.frame_diff import FrameChangeDetector
+from services.capture_scheduler import CaptureScheduler
+from services.frame_bus import FrameBus
+from services.frame_encoder import FrameEncoder, EncodeProfile, run_in_encoder
+from services.storage_state import storage_state_store
+from services.product_crawler import login_to_product
+from services.network_policy import NetworkPolicy, NetworkInterceptor, http_cache
+from services.prefetcher import DemoPrefetcher
+from services.tool_speculation import ToolSpeculator
+from services.tool_executor import ToolExecutor
+from services.audio_bridge import AudioBridge
+from services.voice_activity import VoiceActivityDetector
+from services.barge_in import BargeInController
 
 class Orchestrator:
-    def __init__(self, websocket=None):
+    def __init__(self, websocket=None, change_threshold=None,
+                 capture_min_interval=None, capture_max_interval=None, capture_mode=None,
+                 vision_profile=None, viewer_profile=None, browser_pool=None, product=None,
+                 realtime_pool=None):
         self.websocket = websocket
-        self.realtime_client = RealtimeClient()
-        self.browser_manager = BrowserManager()
-        self.video_stream = VideoStream()
+        self.product = product
+        self.audio_bridge = None  # Set when the viewer negotiates microphone audio
+        self.barge_in = None
+        self.realtime_client = RealtimeClient(pool=realtime_pool)
+        self.browser_manager = BrowserManager(
+            capture_mode=capture_mode or config.CAPTURE_MODE,
+            capture_quality=config.CAPTURE_QUALITY,
+            headless=config.BROWSER_HEADLESS,
+            pool=browser_pool,
+            network=NetworkInterceptor(NetworkPolicy.for_product(product), http_cache)
+            if config.NETWORK_POLICY_ENABLED else None,
+            # A headed browser would show the prefetch tab and take focus from the buyer's page
+            prefetcher=DemoPrefetcher(product.get("demo_script"), product.get("element_map"), product.get("url"))
+            if product and config.PREFETCH_ENABLED and config.BROWSER_HEADLESS else None
+        )
+        if product:
+            self.browser_manager.selector_resolver.set_product(product["id"], product.get("element_map"))
+        # Serializes page-mutating tool calls with per-action deadlines
+        self.tool_executor = ToolExecutor(
+            self.run_tool, self.realtime_client.send_tool_output,
+            request_response=self.realtime_client.request_response
+        )
+        self.tool_speculator = ToolSpeculator(self.browser_manager, is_idle=self.tool_executor.is_idle)
+        self.frame_bus = FrameBus()
+        self.frame_detector = FrameChangeDetector(
+            threshold=change_threshold if change_threshold is not None else config.VISION_CHANGE_THRESHOLD
+        )
+        self.capture_scheduler = CaptureScheduler(
+            min_interval=capture_min_interval or config.CAPTURE_MIN_INTERVAL,
+            max_interval=capture_max_interval or config.CAPTURE_MAX_INTERVAL
+        )
+        # The model copes with a small image; viewers get full fidelity
+        self.frame_encoder = FrameEncoder(source_quality=config.CAPTURE_QUALITY)
+        self.vision_profile = vision_profile or EncodeProfile(
+            "vision", max_width=config.VISION_MAX_WIDTH, quality=config.VISION_JPEG_QUALITY
+        )
+        self.viewer_profile = viewer_profile or EncodeProfile(
+            "viewer", max_width=config.VIEWER_MAX_WIDTH, quality=config.VIEWER_JPEG_QUALITY
+        )
+        # Every viewer of this demo (buyer, watchers) is fed from one broadcaster
+        self.video_stream = VideoStream(self.frame_encoder, self.viewer_profile)
         
     async def start(self):
         print("Orchestrator starting...")
         
-        # Start Browser
-        await self.browser_manager.start_browser()
+        # Start Browser, already logged in when the product has a fresh login snapshot
+        snapshot = storage_state_store.load(self.product["id"]) if self.product else None
+        await self.browser_manager.start_browser(storage_state=snapshot["state"] if snapshot else None)
+        if self.product:
+            await self.open_product(snapshot)
         
-        # Start Video Stream (Stub)
-        await self.video_stream.start()
+        # Start Video Stream, fed from the shared frame bus; the buyer gets JSON
+        # frames until the "hello" handshake negotiates something better
+        await self.video_stream.start(self.frame_bus)
+        if self.websocket and "buyer" not in self.video_stream.viewers:
+            self.video_stream.subscribe("buyer", self.websocket.send)
         
         # Setup Callbacks
         self.realtime_client.set_on_tool_call(self.handle_tool_call)
+        self.realtime_client.set_on_tool_call_delta(self.tool_speculator.on_delta)
+        self.realtime_client.set_on_response_done(self.handle_response_done)
+        self.realtime_client.set_on_session_reset(self.handle_session_reset)
+        self.browser_manager.set_on_activity(self.handle_page_activity)
         
-        # Connect to AI
-        await self.realtime_client.connect()
-        
-        # Start Vision Loop
+        # Start capture and frame consumers (connect() below only returns once the socket closes)
+        asyncio.create_task(self.capture_loop())
         asyncio.create_task(self.vision_loop())
         
+        # Connect to AI (reconnects on its own until stop())
+        await self.realtime_client.connect()
+        
         # Keep alive
         while True:
             await asyncio.sleep(1)
 
+    async def open_product(self, snapshot):
+        """
+        Land on the product's start page. Logs in (and refreshes the snapshot)
+        only when the snapshot is missing, expired or no longer accepted.
+        """
+        product_id = self.product["id"]
+        try:
+            if snapshot:
+                await self.browser_manager.navigate(snapshot.get("start_url") or self.product["url"])
+                if not await self.browser_manager.is_login_page():
+                    print(f"🔑 Reused login snapshot for {product_id}")
+                    return
+                print(f"🔑 Login snapshot for {product_id} rejected, logging in again")
+                await self.browser_manager.context.clear_cookies()
+            
+            page = self.browser_manager.page
+            await login_to_product(page, self.product["url"], self.product.get("credentials") or {})
+            storage_state_store.save(product_id, await self.browser_manager.context.storage_state(), start_url=page.url)
+        except Exception as e:
+            print(f"Failed to open product {product_id}: {e}")
+
     async def stop(self):
+        if self.audio_bridge:
+            self.audio_bridge.stop()
+        await self.tool_executor.stop()
         await self.video_stream.stop()
         await self.realtime_client.close()
         await self.browser_manager.close()
 
-    async def handle_tool_call(self, call_id, name, args):
+    async def handle_tool_call(self, call_id, name, args, response_id=None):
         print(f"Tool Call: {name} args={args}")
         
+        # Adopt (or roll back) prep started while the arguments were streaming
+        await self.tool_speculator.confirm(call_id, name, args)
+        self.tool_executor.submit(call_id, name, args, response_id)
+
+    def handle_response_done(self, response_id, status):
+        # The next response waits for the last tool output of this one
+        self.tool_executor.response_done(response_id, status)
+        # Head starts for calls that never completed (e.g. cancelled by barge-in)
+        self.tool_speculator.on_response_done(response_id, status)
+
+    def handle_session_reset(self):
+        # Reconnected: responses and calls from the old socket will never complete
+        self.tool_executor.reset()
+        self.tool_speculator.reset()
+
+    async def run_tool(self, name, args):
+        """Execute one tool call and return its output (called by the ToolExecutor)."""
         if name == "browser_action":
             try:
                 arguments = json.loads(args)
@@ -51,34 +159,124 @@ class Orchestrator:
                 result = await self.browser_manager.do_action(action, selector, value)
             except Exception as e:
                 result = f"Error processing arguments: {e}"
+        elif name == "browser_macro":
+            try:
+                arguments = json.loads(args)
+                started = time.perf_counter()
+                steps = await self.browser_manager.run_steps(
+                    arguments.get("steps") or [],
+                    stop_on_error=arguments.get("stop_on_error", True)
+                )
+                # One combined result instead of a model round trip per step
+                result = json.dumps({
+                    "completed": sum(1 for step in steps if step["ok"]),
+                    "total_steps": len(arguments.get("steps") or []),
+                    "total_ms": round((time.perf_counter() - started) * 1000),
+                    "steps": steps
+                })
+            except Exception as e:
+                result = f"Error processing arguments: {e}"
         else:
             result = f"Unknown tool: {name}"
             
-        await self.realtime_client.send_tool_output(call_id, result)
+        return result
+
+    def handle_page_activity(self, kind):
+        if kind == "mutation":
+            self.capture_scheduler.notify_mutation()
+        else:
+            self.capture_scheduler.notify(kind)
+
+    def set_viewer_protocol(self, binary_frames=False, tiles=False):
+        """Apply the buyer's negotiated frame protocol. Tiles require binary frames."""
+        return self.video_stream.subscribe("buyer", self.websocket.send, binary_frames, tiles)
+
+    def enable_audio_bridge(self, sample_rate):
+        """Stream the viewer's microphone to the model and the model's speech back."""
+        if self.audio_bridge:
+            self.audio_bridge.stop()
+        self.audio_bridge = AudioBridge(self.realtime_client, self.websocket, input_rate=sample_rate)
+        
+        # Buyer speech (local VAD or server VAD) interrupts the agent
+        self.barge_in = BargeInController(
+            self.realtime_client,
+            flush=self.audio_bridge.flush_output,
+            played_ms=self.audio_bridge.played_ms,
+            is_playing=self.audio_bridge.is_playing
+        )
+        if config.AUDIO_VAD_ENABLED:
+            # Only sustained speech interrupts; a click or mic pop just opens the gate
+            self.audio_bridge.vad = VoiceActivityDetector(on_sustained_speech=self.barge_in.trigger)
+        self.audio_bridge.start()
+        self.realtime_client.set_on_audio_delta(self.audio_bridge.push_output)
+        self.realtime_client.set_on_speech_started(lambda: self.barge_in.trigger("server"))
+
+    def get_stats(self):
+        stats = {
+            "browser": {"time_to_page_ms": self.browser_manager.time_to_page_ms},
+            "storage_state": storage_state_store.get_stats(),
+            "selectors": self.browser_manager.selector_resolver.get_stats(),
+            "speculation": self.tool_speculator.get_stats(),
+            "tools": self.tool_executor.get_stats(),
+            "realtime": self.realtime_client.get_stats(),
+            "network": self.browser_manager.get_navigation_stats(),
+            "vision": self.frame_detector.get_stats(),
+            "capture": self.capture_scheduler.get_stats(),
+            "frame_bus": self.frame_bus.get_stats(),
+            "video": self.video_stream.get_stats()
+        }
+        if self.browser_manager.prefetcher:
+            stats["prefetch"] = self.browser_manager.prefetcher.get_stats()
+        if self.audio_bridge:
+            stats["audio"] = self.audio_bridge.get_stats()
+            stats["barge_in"] = self.barge_in.get_stats()
+        return stats
+
+    async def capture_loop(self):
+        print("Capture Loop started.")
+        
+        while True:
+            # Capture right after actions/navigations, back off while the page is idle
+            await self.capture_scheduler.wait()
+            try:
+                screenshot = await self.browser_manager.get_screenshot()
+                if not screenshot:
+                    continue
+                
+                # Skip frames that look the same as the last one we published
+                changed = await run_in_encoder(self.frame_detector.has_changed, screenshot)
+                self.capture_scheduler.record(changed)
+                if not changed:
+                    continue
+                
+                # Captured once, shared by vision and every VideoStream viewer
+                self.frame_bus.publish(screenshot)
+                
+            except Exception as e:
+                print(f"Capture loop error: {e}")
 
     async def vision_loop(self):
         print("Vision Loop started.")
-        screenshot_count = 0
+        subscription = self.frame_bus.subscribe("vision")
         
         while True:
-            await asyncio.sleep(2)  # Send to OpenAI every 2 seconds (as per PRD)
+            frame = await subscription.get()
+            while not self.realtime_client.ws:
+                await asyncio.sleep(0.5)
             try:
-                screenshot_base64 = await self.browser_manager.get_screenshot_base64()
-                if screenshot_base64:
-                    screenshot_count += 1
-                    
-                    # Send to OpenAI for vision analysis (AI can "see" the page)
-                    await self.realtime_client.send_image(screenshot_base64)
-                    print(f"👁️  Sent screenshot #{screenshot_count} to OpenAI for vision analysis")
-                    
-                    # Also send to frontend for user display (every other frame to reduce bandwidth)
-                    if screenshot_count % 2 == 0 and self.websocket:
-                        await self.websocket.send(json.dumps({
-                            'type': 'video_frame',
-                            'data': screenshot_base64,
-                            'timestamp': asyncio.get_event_loop().time()
-                        }))
-                        print("📸 Sent video frame to frontend")
-                        
+                # Send to OpenAI for vision analysis (AI can "see" the page)
+                encoded = await self.frame_encoder.encode(frame, self.vision_profile)
+                image_base64 = await self.frame_encoder.base64(encoded)
+                await self.realtime_client.send_image(image_base64, encoded.mime_type, caption=await self.page_caption())
+                print(f"👁️  Sent screenshot #{frame.seq} to OpenAI for vision analysis "
+                      f"({self.frame_detector.frames_skipped} unchanged frames skipped)")
             except Exception as e:
                 print(f"Vision loop error: {e}")
+
+    async def page_caption(self):
+        """Short text stand-in for a screenshot once it is evicted from the model's context."""
+        page = self.browser_manager.page
+        try:
+            return f"{await page.title()} ({page.url})"
+        except Exception:
+            return page.url if page else None
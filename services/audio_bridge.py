@@ -0,0 +1,181 @@
+# Audio Bridge - streams buyer microphone audio from the web frontend to the
+# Realtime API and the model's speech back, as binary PCM16 websocket frames
+
+import asyncio
+import base64
+import json
+import logging
+import time
+import numpy as np
+from services import frame_protocol
+
+logger = logging.getLogger(__name__)
+
+# The Realtime API's pcm16 format: 24 kHz, mono, little-endian
+REALTIME_SAMPLE_RATE = 24000
+
+class Resampler:
+    """
+    Streaming linear-interpolation resampler for mono PCM16 (np.interp).
+    Carries the last input sample and the fractional read position across
+    chunks so consecutive chunks join without clicks.
+    """
+
+    def __init__(self, src_rate: int, dst_rate: int = REALTIME_SAMPLE_RATE):
+        self.src_rate = src_rate
+        self.dst_rate = dst_rate
+        self.step = src_rate / dst_rate
+        self.position = 0.0  # Next output position, in input samples relative to `previous`
+        self.previous = None
+
+    def process(self, pcm: bytes) -> bytes:
+        if self.src_rate == self.dst_rate:
+            return pcm
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+        if self.previous is not None:
+            samples = np.concatenate(([self.previous], samples))
+        if len(samples) < 2:
+            self.previous = samples[-1] if len(samples) else self.previous
+            return b""
+
+        positions = np.arange(self.position, len(samples) - 1, self.step)
+        out = np.interp(positions, np.arange(len(samples)), samples)
+
+        # Continue from the last input sample on the next chunk
+        self.position = (positions[-1] + self.step) - (len(samples) - 1) if len(positions) else self.position - (len(samples) - 1)
+        self.previous = samples[-1]
+        return np.clip(np.round(out), -32768, 32767).astype("<i2").tobytes()
+
+class AudioBridge:
+    """
+    Per-session audio path between a frontend websocket and RealtimeClient.
+
+    - Uplink: AUDIO_INPUT frames -> resample to 24 kHz -> optional VAD ->
+      input_audio_buffer.append
+    - Downlink: response.audio.delta -> AUDIO_OUTPUT frames
+    - Both directions are bounded queues that drop the oldest audio when a
+      side falls behind, so a slow peer never grows memory or latency
+    """
+
+    def __init__(self, realtime_client, websocket, input_rate=REALTIME_SAMPLE_RATE, vad=None,
+                 max_pending=50, max_output_pending=500):
+        """
+        Args:
+            realtime_client: Session RealtimeClient
+            websocket: Frontend websocket
+            input_rate: Sample rate the frontend captures at (e.g. 44100, 48000)
+            vad: Optional VoiceActivityDetector run on the resampled audio
+            max_pending: Microphone frames buffered before the oldest is dropped
+            max_output_pending: Model audio deltas buffered (the model sends
+                faster than real time, so this side is deeper)
+        """
+        self.realtime_client = realtime_client
+        self.websocket = websocket
+        self.resampler = Resampler(input_rate)
+        self.vad = vad
+        self.uplink = asyncio.Queue(maxsize=max_pending)
+        self.downlink = asyncio.Queue(maxsize=max_output_pending)
+        self.tasks = []
+        self.output_seq = 0
+        
+        # Current reply, to estimate how much of it the browser has played
+        self.item_id = None
+        self.item_started_at = None
+        self.item_audio_ms = 0.0
+
+        # Stats
+        self.input_frames = 0
+        self.input_dropped = 0
+        self.output_frames = 0
+        self.output_dropped = 0
+        self.output_ms = 0.0
+
+    def start(self):
+        self.tasks = [
+            asyncio.create_task(self._uplink_loop()),
+            asyncio.create_task(self._downlink_loop())
+        ]
+
+    @staticmethod
+    def _put_latest(queue, item) -> bool:
+        """Queue an item, dropping the oldest one if full. Returns False if something was dropped."""
+        dropped = False
+        if queue.full():
+            queue.get_nowait()
+            dropped = True
+        queue.put_nowait(item)
+        return not dropped
+
+    def push_input(self, pcm: bytes):
+        """Frontend microphone audio (PCM16 mono at input_rate)."""
+        self.input_frames += 1
+        if not self._put_latest(self.uplink, bytes(pcm)):
+            self.input_dropped += 1
+
+    def push_output(self, audio_base64: str, item_id=None):
+        """A response.audio.delta from the model (PCM16 mono, 24 kHz)."""
+        pcm = base64.b64decode(audio_base64)
+        if item_id != self.item_id or self.item_started_at is None:
+            self.item_id = item_id
+            self.item_started_at = time.monotonic()
+            self.item_audio_ms = 0.0
+        self.item_audio_ms += len(pcm) / 2 / REALTIME_SAMPLE_RATE * 1000
+        if not self._put_latest(self.downlink, pcm):
+            self.output_dropped += 1
+
+    def played_ms(self) -> float:
+        """The browser plays as soon as audio arrives, so played = min(received, elapsed)."""
+        if self.item_started_at is None:
+            return 0.0
+        return min(self.item_audio_ms, (time.monotonic() - self.item_started_at) * 1000)
+
+    def is_playing(self) -> bool:
+        return self.item_started_at is not None and self.played_ms() < self.item_audio_ms
+
+    async def flush_output(self):
+        """Drop model audio not yet sent and tell the frontend to stop what it has queued."""
+        while not self.downlink.empty():
+            self.downlink.get_nowait()
+        self.item_started_at = None
+        await self.websocket.send(json.dumps({"type": "audio_flush"}))
+
+    async def _uplink_loop(self):
+        while True:
+            pcm = await self.uplink.get()
+            try:
+                audio = self.resampler.process(pcm)
+                for frame in (self.vad.process(audio) if self.vad else [audio]):
+                    await self.realtime_client.send_audio(base64.b64encode(frame).decode("utf-8"))
+            except Exception as e:
+                logger.error(f"Audio uplink error: {e}")
+
+    async def _downlink_loop(self):
+        while True:
+            pcm = await self.downlink.get()
+            try:
+                await self.websocket.send(frame_protocol.encode_message(
+                    frame_protocol.AUDIO_OUTPUT, self.output_seq, pcm, time.time()
+                ))
+                self.output_seq += 1
+                self.output_frames += 1
+                self.output_ms += len(pcm) / 2 / REALTIME_SAMPLE_RATE * 1000
+            except Exception as e:
+                logger.error(f"Audio downlink error: {e}")
+
+    def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        self.tasks = []
+
+    def get_stats(self) -> dict:
+        return {
+            "input_rate": self.resampler.src_rate,
+            "input_frames": self.input_frames,
+            "input_dropped": self.input_dropped,
+            "uplink_queued": self.uplink.qsize(),
+            "output_frames": self.output_frames,
+            "output_dropped": self.output_dropped,
+            "output_ms": round(self.output_ms),
+            "downlink_queued": self.downlink.qsize(),
+            "vad": self.vad.get_stats() if self.vad else None
+        }
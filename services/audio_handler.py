@@ -4,16 +4,66 @@ import pyaudio
 import wave
 import base64
 from io import BytesIO
+from services.audio_playback import PlaybackEngine
 
 logger = logging.getLogger(__name__)
 
+class AudioRingBuffer:
+    """
+    Single-producer / single-consumer byte ring buffer.
+
+    The PortAudio thread only writes and advances write_total; the event loop
+    only reads and advances read_total. Each counter has a single writer, so
+    no lock is needed and the audio callback never blocks.
+    """
+
+    def __init__(self, capacity: int):
+        self.buffer = bytearray(capacity)
+        self.capacity = capacity
+        self.write_total = 0
+        self.read_total = 0
+
+    def available(self) -> int:
+        return self.write_total - self.read_total
+
+    def write(self, data: bytes) -> bool:
+        """Producer side. Returns False (and drops the data) if it does not fit."""
+        size = len(data)
+        if size > self.capacity - self.available():
+            return False
+        start = self.write_total % self.capacity
+        first = min(size, self.capacity - start)
+        self.buffer[start:start + first] = data[:first]
+        self.buffer[:size - first] = data[first:]
+        self.write_total += size  # Publish only after the bytes are in place
+        return True
+
+    def read(self, size: int) -> bytes:
+        """Consumer side. Caller checks available() first."""
+        start = self.read_total % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(self.buffer[start:start + first]) + bytes(self.buffer[:size - first])
+        self.read_total += size
+        return data
+
 class AudioHandler:
     """
     Handles microphone input and speaker output for real-time audio streaming.
     Integrates with Azure OpenAI Realtime API's audio capabilities.
     """
     
-    def __init__(self, sample_rate=24000, channels=1, chunk_size=1024):
+    def __init__(self, sample_rate=24000, channels=1, chunk_size=1024, frame_ms=40, ring_seconds=2.0, vad=None):
+        """
+        Args:
+            sample_rate: PCM16 sample rate (the Realtime API uses 24 kHz)
+            channels: Channel count
+            chunk_size: Frames per PortAudio callback
+            frame_ms: Microphone audio is coalesced into frames of this length
+                (20-100 ms) before it is encoded and handed to the callback
+            ring_seconds: Capacity of the capture ring buffer
+            vad: Optional VoiceActivityDetector; only speech frames (plus
+                pre-roll and hangover) reach the callback
+        """
         self.sample_rate = sample_rate
         self.channels = channels
         self.chunk_size = chunk_size
@@ -23,6 +73,24 @@ class AudioHandler:
         self.is_recording = False
         self.is_playing = False
         
+        frame_ms = min(max(frame_ms, 20), 100)
+        self.frame_bytes = int(sample_rate * frame_ms / 1000) * channels * 2
+        self.ring = AudioRingBuffer(int(sample_rate * ring_seconds) * channels * 2)
+        self.loop = None
+        self.data_ready = None
+        self.wakeup_pending = False
+        self.consumer_task = None
+        self.playback = None
+        self.playback_item = None
+        self.vad = vad
+        
+        # Capture stats
+        self.chunks_captured = 0
+        self.frames_sent = 0
+        self.ring_overruns = 0
+        self.input_overflows = 0
+        self.wakeups = 0
+        
     async def initialize(self):
         """Initialize PyAudio"""
         try:
@@ -42,6 +110,9 @@ class AudioHandler:
             return
         
         try:
+            self.loop = asyncio.get_running_loop()
+            self.data_ready = asyncio.Event()
+            self.consumer_task = asyncio.create_task(self._mic_consumer(callback))
             self.input_stream = self.audio.open(
                 format=pyaudio.paInt16,
                 channels=self.channels,
@@ -49,7 +120,7 @@ class AudioHandler:
                 input=True,
                 frames_per_buffer=self.chunk_size,
                 stream_callback=lambda in_data, frame_count, time_info, status: 
-                    self._mic_callback(in_data, callback)
+                    self._mic_callback(in_data, status)
             )
             
             self.is_recording = True
@@ -59,29 +130,85 @@ class AudioHandler:
         except Exception as e:
             logger.error(f"Failed to start microphone: {e}")
     
-    def _mic_callback(self, in_data, callback):
-        """Internal callback for microphone stream"""
+    def _mic_callback(self, in_data, status):
+        """
+        Internal callback for microphone stream. Runs on PortAudio's thread:
+        copy into the ring buffer and wake the event loop at most once per frame.
+        """
         if self.is_recording:
-            # Convert to base64 and send to callback
-            audio_base64 = base64.b64encode(in_data).decode('utf-8')
-            asyncio.create_task(callback(audio_base64))
+            self.chunks_captured += 1
+            if status & pyaudio.paInputOverflow:
+                self.input_overflows += 1
+            if not self.ring.write(in_data):
+                self.ring_overruns += 1
+            elif self.ring.available() >= self.frame_bytes and not self.wakeup_pending:
+                self.wakeup_pending = True
+                self.loop.call_soon_threadsafe(self.data_ready.set)
         return (None, pyaudio.paContinue)
     
+    async def _mic_consumer(self, callback):
+        """Drain whole frames from the ring buffer and hand them to the callback."""
+        while True:
+            await self.data_ready.wait()
+            self.data_ready.clear()
+            self.wakeup_pending = False
+            self.wakeups += 1
+            while self.ring.available() >= self.frame_bytes:
+                frame = self.ring.read(self.frame_bytes)
+                # Silence never leaves the machine when a VAD is attached
+                for speech_frame in (self.vad.process(frame) if self.vad else [frame]):
+                    self.frames_sent += 1
+                    try:
+                        await callback(base64.b64encode(speech_frame).decode('utf-8'))
+                    except Exception as e:
+                        logger.error(f"Microphone callback failed: {e}")
+    
     async def stop_microphone(self):
         """Stop microphone capture"""
         if self.input_stream:
             self.is_recording = False
             self.input_stream.stop_stream()
             self.input_stream.close()
+            self.input_stream = None
+            if self.consumer_task:
+                self.consumer_task.cancel()
+                self.consumer_task = None
             logger.info("Microphone stopped")
     
-    async def play_audio(self, audio_base64: str):
+    def get_stats(self) -> dict:
+        return {
+            "chunks_captured": self.chunks_captured,
+            "frames_sent": self.frames_sent,
+            "frame_ms": self.frame_bytes / (self.sample_rate * self.channels * 2) * 1000,
+            "ring_buffered_ms": self.ring.available() / (self.sample_rate * self.channels * 2) * 1000,
+            "ring_overruns": self.ring_overruns,
+            "input_overflows": self.input_overflows,
+            "wakeups": self.wakeups,
+            "playback": self.playback.get_stats() if self.playback else None,
+            "vad": self.vad.get_stats() if self.vad else None
+        }
+    
+    def attach(self, realtime_client):
+        """
+        Play the model's speech from a RealtimeClient. The end of each reply
+        is signalled so its tail plays out instead of counting as an underrun.
+        """
+        realtime_client.set_on_audio_delta(self.queue_audio)
+        realtime_client.set_on_audio_done(lambda item_id: self.end_playback())
+    
+    async def play_audio(self, audio_base64: str, item_id=None):
         """
         Play audio through speakers.
+        Queues the audio on the playback thread's jitter buffer and returns immediately.
         
         Args:
             audio_base64: Base64 encoded audio data
+            item_id: Conversation item the audio belongs to (for barge-in truncation)
         """
+        self.queue_audio(audio_base64, item_id)
+    
+    def queue_audio(self, audio_base64: str, item_id=None):
+        """Synchronous play_audio(), for event callbacks that must keep delta order."""
         try:
             audio_bytes = base64.b64decode(audio_base64)
             
@@ -92,16 +219,46 @@ class AudioHandler:
                     rate=self.sample_rate,
                     output=True
                 )
+                # Blocking writes happen on the engine's own thread, never on the event loop
+                self.playback = PlaybackEngine(
+                    self.output_stream.write, sample_rate=self.sample_rate, channels=self.channels
+                )
+                self.playback.start()
             
-            self.output_stream.write(audio_bytes)
+            if item_id != self.playback_item:
+                self.playback_item = item_id
+                self.playback.reset_position()
+            self.playback.enqueue(audio_bytes)
             
         except Exception as e:
             logger.error(f"Failed to play audio: {e}")
     
+    def end_playback(self):
+        """The current reply is complete; play out what is buffered."""
+        if self.playback:
+            self.playback.end_of_stream()
+    
+    def flush_playback(self) -> float:
+        """
+        Drop queued speaker audio (barge-in). Returns the milliseconds discarded.
+        Only the frame already handed to the device (20 ms) still plays.
+        """
+        return self.playback.flush() if self.playback else 0.0
+    
+    def played_ms(self) -> float:
+        """How much of the current reply has been played."""
+        return self.playback.played_ms() if self.playback else 0.0
+    
+    def is_playing(self) -> bool:
+        return bool(self.playback and self.playback.buffered_ms() > 0)
+    
     async def cleanup(self):
         """Clean up audio resources"""
         await self.stop_microphone()
         
+        if self.playback:
+            self.playback.stop()
+        
         if self.output_stream:
             self.output_stream.stop_stream()
             self.output_stream.close()
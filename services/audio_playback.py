@@ -0,0 +1,169 @@
+# Audio Playback - jitter-buffered speaker output on its own thread
+# Blocking output writes never touch the event loop
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class PlaybackEngine:
+    """
+    Plays PCM16 audio from an adaptive jitter buffer.
+
+    - enqueue() is non-blocking; a dedicated thread writes fixed-size frames
+    - Playback (re)starts once target_ms of audio is buffered; every underrun
+      raises the target by one frame, long smooth stretches lower it again
+    - flush() drops everything queued; at most the frame being written still
+      plays, so barge-in is silent within one frame
+    """
+
+    def __init__(self, write, sample_rate=24000, channels=1, frame_ms=20,
+                 min_prebuffer_ms=60, max_prebuffer_ms=300):
+        """
+        Args:
+            write: Blocking function that plays raw PCM16 bytes (e.g. a PyAudio stream's write)
+            sample_rate: PCM16 sample rate
+            channels: Channel count
+            frame_ms: Audio written per output call
+            min_prebuffer_ms / max_prebuffer_ms: Bounds of the adaptive jitter buffer
+        """
+        self.write = write
+        self.bytes_per_ms = sample_rate * channels * 2 / 1000
+        self.frame_ms = frame_ms
+        self.frame_bytes = self._align(frame_ms * self.bytes_per_ms)
+        self.min_prebuffer_ms = min_prebuffer_ms
+        self.max_prebuffer_ms = max_prebuffer_ms
+        self.target_ms = min_prebuffer_ms
+        self.buffer = bytearray()
+        self.condition = threading.Condition()
+        self.prebuffering = True
+        self.draining = False
+        self.last_enqueue = 0.0
+        self.running = False
+        self.thread = None
+        self.played_bytes = 0  # Since the last reset_position(), for truncating interrupted replies
+
+        # Stats
+        self.frames_played = 0
+        self.underruns = 0
+        self.flushes = 0
+        self.smooth_frames = 0
+
+    @staticmethod
+    def _align(size):
+        return int(size) // 2 * 2  # Whole PCM16 samples
+
+    def start(self):
+        if self.running:
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="audio-playback", daemon=True)
+        self.thread.start()
+
+    def enqueue(self, pcm: bytes):
+        with self.condition:
+            self.buffer.extend(pcm)
+            self.draining = False
+            self.last_enqueue = time.monotonic()
+            self.condition.notify()
+
+    def end_of_stream(self):
+        """The current reply is complete: play out the tail without waiting for more."""
+        with self.condition:
+            self.draining = True
+            self.condition.notify()
+
+    def flush(self) -> float:
+        """Drop all queued audio. Returns the milliseconds that were discarded."""
+        with self.condition:
+            dropped_ms = len(self.buffer) / self.bytes_per_ms
+            self.buffer.clear()
+            self.prebuffering = True
+            self.draining = False
+            self.flushes += 1
+            self.condition.notify()
+        return dropped_ms
+
+    def reset_position(self):
+        with self.condition:
+            self.played_bytes = 0
+
+    def played_ms(self) -> float:
+        return self.played_bytes / self.bytes_per_ms
+
+    def buffered_ms(self) -> float:
+        return len(self.buffer) / self.bytes_per_ms
+
+    def _next_frame(self):
+        """Wait for and cut the next frame. Returns None when stopping."""
+        with self.condition:
+            while self.running:
+                buffered = len(self.buffer)
+                if self.prebuffering:
+                    target_bytes = self._align(self.target_ms * self.bytes_per_ms)
+                    # Start at the target depth, or with whatever is left once the reply is complete
+                    stalled = buffered and time.monotonic() - self.last_enqueue > self.target_ms / 1000
+                    if buffered >= target_bytes or (buffered and (self.draining or stalled)):
+                        self.prebuffering = False
+                    else:
+                        self.condition.wait(timeout=self.frame_ms / 1000)
+                        continue
+
+                if buffered >= self.frame_bytes:
+                    frame = bytes(self.buffer[:self.frame_bytes])
+                    del self.buffer[:self.frame_bytes]
+                    self._on_smooth_frame()
+                    return frame
+
+                # Less than a frame left: pad the tail with silence instead of stalling the device
+                frame = bytes(self.buffer) + bytes(self.frame_bytes - buffered)
+                self.buffer.clear()
+                self.prebuffering = True
+                if not self.draining:
+                    self._on_underrun()
+                if buffered:
+                    return frame
+            return None
+
+    def _on_smooth_frame(self):
+        self.smooth_frames += 1
+        # Ten seconds without an underrun: try a shallower buffer
+        if self.smooth_frames * self.frame_ms >= 10000 and self.target_ms > self.min_prebuffer_ms:
+            self.target_ms = max(self.min_prebuffer_ms, self.target_ms - self.frame_ms)
+            self.smooth_frames = 0
+
+    def _on_underrun(self):
+        self.underruns += 1
+        self.smooth_frames = 0
+        self.target_ms = min(self.max_prebuffer_ms, self.target_ms + self.frame_ms)
+        logger.debug(f"Playback underrun, jitter buffer target now {self.target_ms}ms")
+
+    def _run(self):
+        while self.running:
+            frame = self._next_frame()
+            if frame is None:
+                break
+            try:
+                self.write(frame)
+            except Exception as e:
+                logger.error(f"Audio output write failed: {e}")
+                continue
+            self.frames_played += 1
+            self.played_bytes += len(frame)
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread:
+            self.thread.join(timeout=1)
+
+    def get_stats(self) -> dict:
+        return {
+            "buffered_ms": self.buffered_ms(),
+            "target_ms": self.target_ms,
+            "frames_played": self.frames_played,
+            "underruns": self.underruns,
+            "flushes": self.flushes
+        }
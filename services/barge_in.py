@@ -0,0 +1,78 @@
+# Barge-in - stops the agent mid-sentence when the buyer starts talking
+
+import asyncio
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class BargeInController:
+    """
+    Reacts to buyer speech (local VAD or the server's speech_started event)
+    while the agent is responding or its audio is still playing:
+
+    1. flush queued playback (local jitter buffer or the browser's queue)
+    2. response.cancel + conversation.item.truncate at the played offset
+
+    Local and server events for the same utterance are de-duplicated because
+    the second one finds nothing left to interrupt.
+    """
+
+    def __init__(self, realtime_client, flush, played_ms, is_playing):
+        """
+        Args:
+            realtime_client: Session RealtimeClient
+            flush: Drops queued playback audio (may be a coroutine function)
+            played_ms: Returns how much of the current reply the buyer heard
+            is_playing: Returns True while reply audio is still audible
+        """
+        self.realtime_client = realtime_client
+        self.flush = flush
+        self.played_ms = played_ms
+        self.is_playing = is_playing
+        self.in_progress = False
+
+        # Stats
+        self.interruptions = {"local": 0, "server": 0}
+        self.ignored = 0
+        self.time_to_silence_ms = []
+
+    def trigger(self, source="local"):
+        """Sync entry point for VAD / event callbacks."""
+        asyncio.create_task(self.on_speech_started(source))
+
+    async def on_speech_started(self, source="local"):
+        if self.in_progress or not (self.realtime_client.active_response_id or self.is_playing()):
+            self.ignored += 1
+            return
+
+        self.in_progress = True
+        started = time.perf_counter()
+        try:
+            played_ms = self.played_ms()
+            result = self.flush()
+            if inspect.isawaitable(result):
+                await result
+            self.realtime_client.interrupt(played_ms)
+
+            elapsed = (time.perf_counter() - started) * 1000
+            self.interruptions[source] += 1
+            self.time_to_silence_ms.append(elapsed)
+            if len(self.time_to_silence_ms) > 100:
+                self.time_to_silence_ms.pop(0)
+            logger.info(f"Barge-in ({source}): reply cut at {played_ms:.0f}ms, silent after {elapsed:.1f}ms")
+        except Exception as e:
+            logger.error(f"Barge-in failed: {e}")
+        finally:
+            self.in_progress = False
+
+    def get_stats(self) -> dict:
+        return {
+            "interruptions": dict(self.interruptions),
+            "ignored": self.ignored,
+            "avg_time_to_silence_ms": (
+                sum(self.time_to_silence_ms) / len(self.time_to_silence_ms) if self.time_to_silence_ms else None
+            ),
+            "max_time_to_silence_ms": max(self.time_to_silence_ms) if self.time_to_silence_ms else None
+        }
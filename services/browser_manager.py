@@ -1,86 +1,381 @@
+import asyncio
 import logging
 import base64
+import re
+import time
 from playwright.async_api import async_playwright, Page, BrowserContext
 from services.security_guardrails import SecurityGuardrails
+from services.screencast import ScreencastCapture
+from services.selector_resolver import SelectorResolver
 
 logger = logging.getLogger(__name__)
 
+# Reports DOM mutations back to Python, coalesced to at most one call per 250ms
+MUTATION_OBSERVER_SCRIPT = """
+(() => {
+    let pending = false;
+    const observer = new MutationObserver(() => {
+        if (pending) return;
+        pending = true;
+        setTimeout(() => {
+            pending = false;
+            if (window.__auraOnMutation) window.__auraOnMutation();
+        }, 250);
+    });
+    observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+})();
+"""
+
 class BrowserManager:
-    def __init__(self):
+    CAPTURE_MODES = ("screenshot", "screencast")
+
+    def __init__(self, capture_mode="screenshot", capture_quality=50, headless=False, pool=None,
+                 network=None, prefetcher=None):
+        """
+        Args:
+            capture_mode: "screenshot" (page.screenshot per capture) or
+                "screencast" (latest frame from the CDP screencast stream)
+            capture_quality: JPEG quality for captured frames
+            headless: Launch Chromium headless (ignored when a pool is used)
+            pool: Running BrowserPool to take an isolated context from instead
+                of launching a dedicated browser
+            network: Optional NetworkInterceptor (request blocking + asset cache)
+            prefetcher: Optional DemoPrefetcher that preloads the next demo step
+        """
+        if capture_mode not in self.CAPTURE_MODES:
+            raise ValueError(f"Unknown capture mode: {capture_mode}")
         self.playwright = None
         self.browser = None
         self.context = None
         self.page = None
         self.security = SecurityGuardrails()
+        self.on_activity_callback = None
+        self.capture_mode = capture_mode
+        self.capture_quality = capture_quality
+        self.headless = headless
+        self.pool = pool
+        self.screencast = None
+        self.time_to_page_ms = None
+        self.selector_resolver = SelectorResolver()
+        self.network = network
+        self.prefetcher = prefetcher
+        self.speculative_navigation = None  # (url, task, previous_url) started from streaming tool arguments
+        self.restore_task = None  # Navigation back from a rolled-back speculative goto
+        self.navigation_ms = []
+
+    def set_on_activity(self, callback):
+        """
+        Register a callback for visible page activity.
+        Called as callback(kind) with kind in "action", "navigation", "mutation".
+        """
+        self.on_activity_callback = callback
+
+    def _emit_activity(self, kind):
+        if self.on_activity_callback:
+            self.on_activity_callback(kind)
 
-    async def start_browser(self):
+    async def start_browser(self, storage_state=None):
+        """
+        Args:
+            storage_state: Optional Playwright storage state (cookies, localStorage)
+                to start the context from, e.g. a saved product login
+        """
         logger.info("Starting Browser Manager...")
-        self.playwright = await async_playwright().start()
-        # Launch headless for now, or new_head=False to see it if local
-        self.browser = await self.playwright.chromium.launch(headless=False, args=["--start-maximized"]) 
-        self.context = await self.browser.new_context(no_viewport=True)
+        started = time.perf_counter()
+        
+        if self.pool:
+            # Warm browser from the pool; only the context is new
+            self.context = await self.pool.acquire_context(
+                viewport={"width": 1280, "height": 720}, storage_state=storage_state
+            )
+        else:
+            self.playwright = await async_playwright().start()
+            if self.headless:
+                self.browser = await self.playwright.chromium.launch(headless=True)
+                self.context = await self.browser.new_context(
+                    viewport={"width": 1280, "height": 720}, storage_state=storage_state
+                )
+            else:
+                self.browser = await self.playwright.chromium.launch(headless=False, args=["--start-maximized"]) 
+                self.context = await self.browser.new_context(no_viewport=True, storage_state=storage_state)
+        
+        if self.network:
+            await self.network.attach(self.context)
+        await self.context.expose_binding("__auraOnMutation", self._on_mutation)
+        await self.context.add_init_script(MUTATION_OBSERVER_SCRIPT)
         self.page = await self.context.new_page()
-        logger.info("Browser started.")
+        self.page.on("framenavigated", self._on_frame_navigated)
+        
+        if self.capture_mode == "screencast":
+            self.screencast = ScreencastCapture(quality=self.capture_quality)
+            await self.screencast.start(self.context, self.page)
+        
+        self.time_to_page_ms = (time.perf_counter() - started) * 1000
+        if self.pool:
+            self.pool.record_time_to_page(self.time_to_page_ms)
+        
+        logger.info(f"Browser started in {self.time_to_page_ms:.0f}ms (capture mode: {self.capture_mode}).")
+
+    def _on_mutation(self, source):
+        # Hidden prefetch pages share the context's binding; only the visible page counts
+        if source["page"] == self.page:
+            self._emit_activity("mutation")
+
+    def _on_frame_navigated(self, frame):
+        if frame == self.page.main_frame:
+            self._emit_activity("navigation")
+            if self.prefetcher:
+                asyncio.create_task(self.prefetcher.note_navigation(frame.url))
+                self.prefetcher.schedule(self.context, self.page)
 
     async def do_action(self, action, selector, value=None):
         """
         Executes a browser action based on the tool call.
         """
+        result, _ = await self._run_action(action, selector, value)
+        return result
+
+    async def _run_action(self, action, selector, value=None):
+        """
+        Returns:
+            (result message, ok)
+        """
         logger.info(f"Executing action: {action} on {selector} (value={value})")
+        await self._settle_restore()
         
         # Security check
         if action == "click":
             if self.security.is_action_prohibited(selector, value or ""):
-                return "Action blocked by security guardrails"
+                return "Action blocked by security guardrails", False
         
         try:
             if action == "goto":
                 await self.navigate(value)
-                return f"Navigated to {value}"
+                return f"Navigated to {value}", True
                 
             elif action == "click":
                 await self.click(selector)
-                return f"Clicked {selector}"
+                return f"Clicked {selector}", True
                 
             elif action == "type":
                 await self.type_text(selector, value)
-                return f"Typed '{value}' into {selector}"
+                return f"Typed '{value}' into {selector}", True
                 
             elif action == "scroll":
                 await self.scroll(selector) # selector implies direction here? Or just generic scroll
-                return f"Scrolled {selector}"
+                return f"Scrolled {selector}", True
 
             elif action == "hover":
-                await self.page.hover(selector)
-                return f"Hovered over {selector}"
+                await self._with_locator(selector, lambda locator, timeout: locator.hover(timeout=timeout))
+                return f"Hovered over {selector}", True
 
             else:
-                return f"Unknown action: {action}"
+                return f"Unknown action: {action}", False
                 
         except Exception as e:
             logger.error(f"Action failed: {e}")
-            return f"Error executing {action}: {str(e)}"
+            return f"Error executing {action}: {str(e)}", False
+        finally:
+            self._emit_activity("action")
+
+    async def wait_for_condition(self, condition, timeout_ms=10000):
+        """
+        Wait for a macro step's condition.
+
+        Args:
+            condition: {"type": "selector" | "load_state" | "url" | "timeout", "value": str}
+        """
+        kind = condition.get("type")
+        value = condition.get("value")
+        
+        if kind == "selector":
+            await self.page.wait_for_selector(value, state="visible", timeout=timeout_ms)
+        elif kind == "load_state":
+            await self.page.wait_for_load_state(value or "load", timeout=timeout_ms)
+        elif kind == "url":
+            await self.page.wait_for_url(value, timeout=timeout_ms)
+        elif kind == "timeout":
+            await asyncio.sleep(min(float(value or 0), timeout_ms) / 1000)
+        else:
+            raise ValueError(f"Unknown wait condition: {kind}")
+
+    async def run_steps(self, steps, stop_on_error=True):
+        """
+        Run an ordered list of actions in one go (the browser_macro tool).
+
+        Args:
+            steps: [{"action", "selector", "value", "wait_for"}, ...]
+            stop_on_error: Skip the remaining steps after the first failure
+
+        Returns:
+            One result per executed step: {"step", "action", "result", "ok", "ms"}
+        """
+        results = []
+        for index, step in enumerate(steps, start=1):
+            started = time.perf_counter()
+            action = step.get("action")
+            result, ok = await self._run_action(action, step.get("selector"), step.get("value"))
+            
+            if ok and step.get("wait_for"):
+                try:
+                    await self.wait_for_condition(step["wait_for"])
+                except Exception as e:
+                    result, ok = f"{result}, but wait_for failed: {e}", False
+            
+            results.append({
+                "step": index,
+                "action": action,
+                "result": result,
+                "ok": ok,
+                "ms": round((time.perf_counter() - started) * 1000)
+            })
+            if not ok and stop_on_error:
+                break
+        return results
+
+    async def prepare_action(self, action, selector=None, value=None):
+        """
+        Idempotent head start for an action whose tool arguments are still
+        streaming: resolve (and cache) the target locator, or start a goto
+        that navigate() adopts if the final URL matches.
+        """
+        if action in ("click", "type", "hover") and selector:
+            if action == "click" and self.security.is_action_prohibited(selector, value or ""):
+                return
+            await self.selector_resolver.resolve(self.page, selector)
+        elif action == "goto" and value:
+            url = self._normalize_url(value)
+            await self._settle_restore()
+            previous_url = self.page.url
+            if self.speculative_navigation:
+                # Replacing an earlier head start: rolling back still means the page before it
+                previous_url = self.speculative_navigation[2]
+                self.discard_speculation(restore=False)
+            task = asyncio.create_task(self._navigate(url))
+            self.speculative_navigation = (url, task, previous_url)
+            await asyncio.shield(task)
+
+    def discard_speculation(self, restore=True):
+        """
+        Roll back a speculative goto the final arguments did not confirm.
+        Cancelling does not stop a navigation Chromium already started (or
+        finished), so the page is taken back to where it was before.
+
+        Args:
+            restore: Navigate back to the previous URL; False when the real
+                action is a goto of its own
+        """
+        if not self.speculative_navigation:
+            return
+        _, task, previous_url = self.speculative_navigation
+        self.speculative_navigation = None
+        task.cancel()
+        if restore:
+            self.restore_task = asyncio.create_task(self._restore(task, previous_url))
+
+    async def _restore(self, task, url):
+        await asyncio.gather(task, return_exceptions=True)
+        if self.page.url == url:
+            return
+        logger.info(f"Rolling back speculative navigation to {url}")
+        try:
+            await self._navigate(url)
+        except Exception as e:
+            logger.warning(f"Rolling back speculative navigation failed: {e}")
+
+    async def _settle_restore(self):
+        """Let a pending rollback finish before the page is used again."""
+        if self.restore_task:
+            task, self.restore_task = self.restore_task, None
+            await task
+
+    @staticmethod
+    def _normalize_url(url):
+        return url if url.startswith("http") else "https://" + url
 
     async def navigate(self, url):
-        if not url.startswith("http"):
-            url = "https://" + url
-        await self.page.goto(url)
+        url = self._normalize_url(url)
+        if self.speculative_navigation:
+            speculative_url, task, _ = self.speculative_navigation
+            if speculative_url == url:
+                # Already on its way since the arguments streamed in
+                self.speculative_navigation = None
+                await task
+                return
+            self.discard_speculation(restore=False)
+        await self._navigate(url)
+
+    async def _navigate(self, url):
+        started = time.perf_counter()
+        warm_page = self.prefetcher.take(url) if self.prefetcher else None
+        if warm_page:
+            await self._swap_page(warm_page)
+        else:
+            await self.page.goto(url)
         await self.page.wait_for_load_state("domcontentloaded")
+        self.navigation_ms.append((time.perf_counter() - started) * 1000)
+        if len(self.navigation_ms) > 100:
+            self.navigation_ms.pop(0)
+
+    async def _swap_page(self, page):
+        """Make a prefetched page the visible one and close the old page."""
+        old_page = self.page
+        self.page = page
+        page.on("framenavigated", self._on_frame_navigated)
+        if self.screencast:
+            await self.screencast.stop()
+            await self.screencast.start(self.context, page)
+        await page.bring_to_front()
+        await old_page.close()
+        self._emit_activity("navigation")
+        self.prefetcher.schedule(self.context, page)
+        logger.info(f"Swapped in prefetched page {page.url}")
+
+    def get_navigation_stats(self) -> dict:
+        stats = {
+            "navigations": len(self.navigation_ms),
+            "avg_navigation_ms": sum(self.navigation_ms) / len(self.navigation_ms) if self.navigation_ms else None
+        }
+        if self.network:
+            stats.update(self.network.get_stats())
+        return stats
+
+    async def is_login_page(self):
+        """Heuristic: the current page asks for a password or lives on a login URL."""
+        if re.search(r"log-?in|sign-?in|auth", self.page.url, re.IGNORECASE):
+            return True
+        return await self.page.locator("input[type='password']").count() > 0
+
+    async def _with_locator(self, selector, action):
+        """
+        Resolve the selector and run action(locator, timeout_ms). Actions get
+        the resolver's short timeout instead of Playwright's 30s default, so a
+        bad strategy fails well inside the tool executor's deadline. If a
+        cached strategy fails (or the call is cancelled), forget it; on
+        failure race all strategies once more.
+        """
+        timeout = self.selector_resolver.timeout_ms
+        locator, strategy, from_cache = await self.selector_resolver.resolve(self.page, selector)
+        try:
+            return await action(locator, timeout)
+        except asyncio.CancelledError:
+            if from_cache:
+                self.selector_resolver.invalidate(self.page, selector)
+            raise
+        except Exception:
+            if not from_cache:
+                raise
+            logger.info(f"Cached '{strategy}' strategy failed for {selector}, re-resolving")
+            self.selector_resolver.invalidate(self.page, selector)
+            locator, _, _ = await self.selector_resolver.resolve(self.page, selector)
+            return await action(locator, timeout)
 
     async def click(self, selector):
-        # Determine if selector is text or css
-        if "text=" not in selector and not selector.startswith("#") and not selector.startswith("."):
-            # Try text matching first if generic string
-            try:
-                await self.page.click(f"text={selector}", timeout=2000)
-                return
-            except:
-                pass
-        
-        await self.page.click(selector)
+        # Text, CSS, ARIA role and element_map interpretations race; first visible wins
+        await self._with_locator(selector, lambda locator, timeout: locator.click(timeout=timeout))
 
     async def type_text(self, selector, text):
-        await self.page.fill(selector, text)
+        await self._with_locator(selector, lambda locator, timeout: locator.fill(text, timeout=timeout))
 
     async def scroll(self, direction="down"):
         if "up" in direction.lower():
@@ -88,14 +383,30 @@ class BrowserManager:
         else:
             await self.page.evaluate("window.scrollBy(0, 500)")
 
-    async def get_screenshot_base64(self):
+    async def get_screenshot(self):
         if not self.page:
             return None
+        if self.screencast:
+            # Latest pushed frame, no capture round trip
+            return self.screencast.get_latest_frame()
         # Playwright screenshot returns PNG by default, quality param only works with JPEG
-        screenshot_bytes = await self.page.screenshot(type='jpeg', quality=50)
+        return await self.page.screenshot(type='jpeg', quality=self.capture_quality)
+
+    async def get_screenshot_base64(self):
+        screenshot_bytes = await self.get_screenshot()
+        if not screenshot_bytes:
+            return None
         return base64.b64encode(screenshot_bytes).decode('utf-8')
 
     async def close(self):
+        if self.prefetcher:
+            await self.prefetcher.close()
+        if self.screencast:
+            await self.screencast.stop()
+        if self.pool and self.context:
+            # Pooled browsers stay up; only this session's context goes away
+            await self.pool.release_context(self.context)
+            return
         if self.context:
             await self.context.close()
         if self.browser:
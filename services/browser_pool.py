@@ -0,0 +1,195 @@
+# Browser Pool - keeps Chromium processes warm and hands out isolated contexts
+
+import asyncio
+import logging
+from playwright.async_api import async_playwright
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class PooledBrowser:
+    def __init__(self, browser):
+        self.browser = browser
+        self.active_contexts = 0
+        self.sessions_served = 0
+        self.retiring = False
+
+    def is_healthy(self) -> bool:
+        return self.browser.is_connected()
+
+class BrowserPool:
+    """
+    Pool of pre-launched Chromium browsers.
+
+    - Each session gets its own BrowserContext (cookies, storage and cache are isolated)
+    - At most max_contexts_per_browser sessions share one Chromium process
+    - Browsers are recycled after serving recycle_after sessions
+    - A background health check replaces crashed browsers and keeps the pool warm
+    """
+
+    def __init__(self, size=2, max_contexts_per_browser=4, recycle_after=50,
+                 headless=True, launch_args=None, health_check_interval=30):
+        self.size = size
+        self.max_contexts_per_browser = max_contexts_per_browser
+        self.recycle_after = recycle_after
+        self.headless = headless
+        self.launch_args = launch_args or []
+        self.health_check_interval = health_check_interval
+        self.playwright = None
+        self.browsers = []
+        self.contexts = {}  # context -> PooledBrowser
+        self.is_running = False
+        self._lock = asyncio.Lock()
+        self._health_task = None
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.browsers_launched = 0
+        self.browsers_recycled = 0
+        self.time_to_page_ms = []
+
+    async def start(self):
+        if self.is_running:
+            return
+        logger.info(f"Starting browser pool ({self.size} browsers, headless={self.headless})...")
+        self.playwright = await async_playwright().start()
+        self.is_running = True
+        async with self._lock:
+            await self._fill()
+        self._health_task = asyncio.create_task(self._health_loop())
+        logger.info("Browser pool ready.")
+
+    async def _launch(self) -> PooledBrowser:
+        browser = await self.playwright.chromium.launch(headless=self.headless, args=self.launch_args)
+        pooled = PooledBrowser(browser)
+        self.browsers.append(pooled)
+        self.browsers_launched += 1
+        return pooled
+
+    async def _fill(self):
+        """Launch browsers until `size` non-retiring ones are warm. Caller holds the lock."""
+        warm = [b for b in self.browsers if not b.retiring]
+        for _ in range(self.size - len(warm)):
+            try:
+                await self._launch()
+            except Exception as e:
+                logger.error(f"Browser launch failed: {e}")
+
+    async def acquire_context(self, **context_options):
+        """
+        Get a fresh, isolated context on a warm browser.
+
+        Args:
+            context_options: Passed through to browser.new_context()
+
+        Returns:
+            A new BrowserContext; hand it back with release_context()
+        """
+        async with self._lock:
+            candidates = [
+                b for b in self.browsers
+                if not b.retiring and b.is_healthy() and b.active_contexts < self.max_contexts_per_browser
+            ]
+            if candidates:
+                pooled = min(candidates, key=lambda b: b.active_contexts)
+                self.hits += 1
+            else:
+                # Pool exhausted (or every browser is unhealthy): cold launch
+                logger.warning("Browser pool miss, launching a new browser")
+                pooled = await self._launch()
+                self.misses += 1
+
+            pooled.active_contexts += 1
+            pooled.sessions_served += 1
+            if pooled.sessions_served >= self.recycle_after:
+                pooled.retiring = True
+
+        try:
+            context = await pooled.browser.new_context(**context_options)
+        except Exception:
+            pooled.active_contexts -= 1
+            raise
+        self.contexts[context] = pooled
+        return context
+
+    async def release_context(self, context):
+        pooled = self.contexts.pop(context, None)
+        try:
+            await context.close()
+        except Exception as e:
+            logger.debug(f"Context close failed: {e}")
+        if pooled:
+            pooled.active_contexts -= 1
+            if pooled.retiring and pooled.active_contexts == 0:
+                await self._retire(pooled)
+
+    async def _retire(self, pooled: PooledBrowser):
+        async with self._lock:
+            if pooled not in self.browsers:
+                return
+            self.browsers.remove(pooled)
+            self.browsers_recycled += 1
+            try:
+                await pooled.browser.close()
+            except Exception as e:
+                logger.debug(f"Browser close failed: {e}")
+            await self._fill()
+
+    async def _health_loop(self):
+        while self.is_running:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                async with self._lock:
+                    for pooled in list(self.browsers):
+                        if not pooled.is_healthy():
+                            logger.warning("Removing disconnected browser from pool")
+                            self.browsers.remove(pooled)
+                    await self._fill()
+                for pooled in list(self.browsers):
+                    if pooled.retiring and pooled.active_contexts == 0:
+                        await self._retire(pooled)
+            except Exception as e:
+                logger.error(f"Browser pool health check failed: {e}")
+
+    def record_time_to_page(self, ms: float):
+        self.time_to_page_ms.append(ms)
+        if len(self.time_to_page_ms) > 100:
+            self.time_to_page_ms.pop(0)
+
+    async def stop(self):
+        self.is_running = False
+        if self._health_task:
+            self._health_task.cancel()
+        for pooled in self.browsers:
+            try:
+                await pooled.browser.close()
+            except Exception:
+                pass
+        self.browsers = []
+        if self.playwright:
+            await self.playwright.stop()
+        logger.info("Browser pool stopped.")
+
+    def get_stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "browsers": len(self.browsers),
+            "active_contexts": sum(b.active_contexts for b in self.browsers),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "browsers_launched": self.browsers_launched,
+            "browsers_recycled": self.browsers_recycled,
+            "avg_time_to_page_ms": (
+                sum(self.time_to_page_ms) / len(self.time_to_page_ms) if self.time_to_page_ms else None
+            )
+        }
+
+# Global pool instance (started by the websocket server when BROWSER_POOL_SIZE > 0)
+browser_pool = BrowserPool(
+    size=config.BROWSER_POOL_SIZE,
+    max_contexts_per_browser=config.BROWSER_MAX_CONTEXTS,
+    recycle_after=config.BROWSER_RECYCLE_AFTER,
+    headless=config.BROWSER_HEADLESS
+)
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+class CaptureScheduler:
+    """
+    Decides when the vision loop should take its next capture.
+
+    - Browser actions and navigations trigger a capture almost immediately
+    - DOM mutations trigger a capture, throttled to the idle polling rate
+    - A change seen by a timer or mutation capture (a carousel, spinner or
+      ticker) keeps polling at the idle rate; only actions speed it up
+    - While frames keep coming back unchanged the interval backs off exponentially
+    """
+
+    def __init__(self, min_interval=0.25, max_interval=8.0, backoff=2.0,
+                 mutation_interval=2.0, settle_delay=0.15):
+        """
+        Args:
+            min_interval: Shortest gap between two captures (seconds)
+            max_interval: Longest gap while the page is idle (seconds)
+            backoff: Interval multiplier applied after each unchanged frame
+            mutation_interval: Idle polling rate: shortest gap for captures triggered by
+                DOM mutations, and the gap after a timer capture that showed a change
+            settle_delay: Delay after a trigger so the page can paint
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.mutation_interval = mutation_interval
+        self.settle_delay = settle_delay
+        self.interval = min_interval
+        self.triggers = {}
+        self._wakeup = asyncio.Event()
+        self._wake_at = float("inf")
+        self._wake_reason = None
+        self._settle_until = 0.0  # Earliest capture time after the pending trigger
+        self._last_capture = 0.0
+        self._last_reason = None
+
+    def notify(self, reason="action"):
+        """Something visible just happened (action, navigation): capture soon."""
+        self.interval = self.min_interval
+        self._request(self._last_capture + self.min_interval, reason)
+
+    def notify_mutation(self):
+        """The DOM changed; capture, but no faster than the idle polling rate."""
+        self._request(self._last_capture + self.mutation_interval, "mutation")
+
+    def _request(self, at, reason):
+        now = asyncio.get_running_loop().time()
+        at = max(at, now + self.settle_delay)
+        if at < self._wake_at:
+            self._wake_at = at
+            self._wake_reason = reason
+            self._settle_until = now + self.settle_delay
+        self._wakeup.set()
+
+    async def wait(self) -> str:
+        """
+        Sleep until the next capture is due.
+
+        Returns:
+            The reason for the capture ("timer" when the idle interval elapsed)
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            deadline = self._last_capture + self.interval
+            if self._wake_reason is not None:
+                # notify() resets the interval, so after an idle spell the timer
+                # deadline is already past; still give the page time to paint
+                deadline = max(min(deadline, self._wake_at), self._settle_until)
+                reason = self._wake_reason
+            else:
+                reason = "timer"
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+        self._wake_at = float("inf")
+        self._wake_reason = None
+        self._settle_until = 0.0
+        self._last_capture = loop.time()
+        self._last_reason = reason
+        self.triggers[reason] = self.triggers.get(reason, 0) + 1
+        return reason
+
+    def record(self, changed: bool):
+        """Feed back whether the last capture showed a change."""
+        if changed:
+            # Follow up quickly only on what an action or navigation caused
+            if self._last_reason in ("timer", "mutation"):
+                self.interval = max(self.min_interval, self.mutation_interval)
+            else:
+                self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def get_stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "min_interval": self.min_interval,
+            "max_interval": self.max_interval,
+            "triggers": dict(self.triggers)
+        }
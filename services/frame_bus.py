@@ -0,0 +1,110 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+class Frame:
+    """A captured JPEG frame plus per-profile encodings shared by all consumers."""
+
+    __slots__ = ("seq", "data", "timestamp", "encodings")
+
+    def __init__(self, seq: int, data: bytes, timestamp: float):
+        self.seq = seq
+        self.data = data
+        self.timestamp = timestamp
+        self.encodings = {}  # profile name -> encode task, see FrameEncoder
+
+class FrameSubscription:
+    """
+    One consumer's view of the bus.
+    get() always returns the newest frame; frames published in between are dropped.
+    """
+
+    def __init__(self, bus, name: str):
+        self.bus = bus
+        self.name = name
+        self.last_seq = 0
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self._event = asyncio.Event()
+
+    def _notify(self):
+        self._event.set()
+
+    async def get(self) -> Frame:
+        """Wait for a frame newer than the last one this subscriber received."""
+        while True:
+            frame = self.bus.latest()
+            if frame is not None and frame.seq > self.last_seq:
+                break
+            self._event.clear()
+            await self._event.wait()
+
+        if self.last_seq:
+            self.frames_dropped += frame.seq - self.last_seq - 1
+        self.last_seq = frame.seq
+        self.frames_received += 1
+        return frame
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+    def get_stats(self) -> dict:
+        return {
+            "frames_received": self.frames_received,
+            "frames_dropped": self.frames_dropped,
+            "lag": self.bus.seq - self.last_seq
+        }
+
+class FrameBus:
+    """
+    Per-session capture-once, multi-consumer frame bus.
+
+    The producer publishes each frame once into a bounded ring buffer.
+    Subscribers (AI vision, VideoStream, websocket viewers) read at their own
+    pace; publishing never waits on a subscriber.
+    """
+
+    def __init__(self, capacity=8):
+        self.frames = deque(maxlen=capacity)
+        self.seq = 0
+        self.subscribers = []
+
+    def publish(self, data: bytes, timestamp: float = None) -> Frame:
+        self.seq += 1
+        frame = Frame(self.seq, data, timestamp if timestamp is not None else time.time())
+        self.frames.append(frame)
+        for subscriber in self.subscribers:
+            subscriber._notify()
+        return frame
+
+    def latest(self):
+        return self.frames[-1] if self.frames else None
+
+    def get(self, seq: int):
+        """Return a frame still held in the ring buffer, or None if it was evicted."""
+        for frame in reversed(self.frames):
+            if frame.seq == seq:
+                return frame
+            if frame.seq < seq:
+                break
+        return None
+
+    def subscribe(self, name: str) -> FrameSubscription:
+        subscription = FrameSubscription(self, name)
+        self.subscribers.append(subscription)
+        logger.info(f"Frame bus subscriber added: {name}")
+        return subscription
+
+    def unsubscribe(self, subscription: FrameSubscription):
+        if subscription in self.subscribers:
+            self.subscribers.remove(subscription)
+            logger.info(f"Frame bus subscriber removed: {subscription.name}")
+
+    def get_stats(self) -> dict:
+        return {
+            "frames_published": self.seq,
+            "subscribers": {s.name: s.get_stats() for s in self.subscribers}
+        }
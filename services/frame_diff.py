@@ -0,0 +1,78 @@
+import io
+import logging
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+def luma_fingerprint(jpeg_bytes: bytes, size=(64, 36)) -> np.ndarray:
+    """
+    Decode a JPEG into a small grayscale (luma) thumbnail.
+
+    Uses Pillow's JPEG draft mode so the decoder scales in the DCT domain
+    instead of decoding the full-resolution frame first.
+
+    Args:
+        jpeg_bytes: Encoded JPEG frame
+        size: (width, height) of the fingerprint grid
+
+    Returns:
+        float32 array of shape (height, width) with values in 0-255
+    """
+    image = Image.open(io.BytesIO(jpeg_bytes))
+    image.draft("L", (size[0] * 2, size[1] * 2))
+    image = image.convert("L").resize(size, Image.BOX)
+    return np.asarray(image, dtype=np.float32)
+
+class FrameChangeDetector:
+    """
+    Decides whether a captured frame differs enough from the last sent frame.
+    Compares downsampled luma fingerprints so JPEG noise and sub-pixel
+    rendering jitter don't count as a page change, while a single cell that
+    visibly changed (a toggled checkbox, a few typed characters) does.
+    """
+
+    def __init__(self, threshold=0.0, pixel_tolerance=8.0, size=(64, 36)):
+        """
+        Args:
+            threshold: Fraction of fingerprint cells that may change without
+                counting as a new frame (0-1, 0 = any changed cell counts)
+            pixel_tolerance: Luma delta (0-255) below which a cell counts as unchanged
+            size: (width, height) of the fingerprint grid
+        """
+        self.threshold = threshold
+        self.pixel_tolerance = pixel_tolerance
+        self.size = size
+        self.last_fingerprint = None
+        self.frames_sent = 0
+        self.frames_skipped = 0
+
+    def has_changed(self, jpeg_bytes: bytes) -> bool:
+        """
+        Check a frame against the last sent one and update the counters.
+        The first frame (and the first after reset()) always counts as changed.
+        """
+        fingerprint = luma_fingerprint(jpeg_bytes, self.size)
+
+        if self.last_fingerprint is not None and self.last_fingerprint.shape == fingerprint.shape:
+            changed_cells = np.count_nonzero(np.abs(fingerprint - self.last_fingerprint) > self.pixel_tolerance)
+            if changed_cells / fingerprint.size <= self.threshold:
+                self.frames_skipped += 1
+                return False
+
+        self.last_fingerprint = fingerprint
+        self.frames_sent += 1
+        return True
+
+    def reset(self):
+        """Forget the last frame so the next one is always sent."""
+        self.last_fingerprint = None
+
+    def get_stats(self) -> dict:
+        total = self.frames_sent + self.frames_skipped
+        return {
+            "frames_sent": self.frames_sent,
+            "frames_skipped": self.frames_skipped,
+            "skip_ratio": self.frames_skipped / total if total else 0.0,
+            "threshold": self.threshold
+        }
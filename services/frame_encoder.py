@@ -0,0 +1,106 @@
+import asyncio
+import base64
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Shared by all sessions. Pillow and NumPy release the GIL for decode/resize/encode,
+# so a thread pool keeps that work off the event loop without pickling frames.
+_executor = None
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=config.ENCODE_WORKERS, thread_name_prefix="frame-encode")
+    return _executor
+
+async def run_in_encoder(func, *args):
+    """Run a CPU-bound frame function on the encoder pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), func, *args)
+
+class EncodeProfile:
+    """How one kind of consumer wants its frames: size, format and quality."""
+
+    FORMATS = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+    def __init__(self, name, max_width=None, quality=75, format="JPEG"):
+        """
+        Args:
+            name: Profile name, also the per-frame cache key
+            max_width: Downscale wider frames to this width (None keeps the capture size)
+            quality: Encoder quality (JPEG/WebP)
+            format: "JPEG", "WEBP" or "PNG"
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f"Unsupported encode format: {format}")
+        self.name = name
+        self.max_width = max_width
+        self.quality = quality
+        self.format = format
+        self.mime_type = self.FORMATS[format]
+
+class EncodedFrame:
+    __slots__ = ("data", "mime_type", "width", "height", "_base64")
+
+    def __init__(self, data: bytes, mime_type: str, width: int, height: int):
+        self.data = data
+        self.mime_type = mime_type
+        self.width = width
+        self.height = height
+        self._base64 = None
+
+def _encode(source: bytes, source_quality: int, profile: EncodeProfile) -> EncodedFrame:
+    image = Image.open(io.BytesIO(source))
+    width, height = image.size
+
+    needs_resize = profile.max_width and width > profile.max_width
+    if not needs_resize and profile.format == "JPEG" and profile.quality >= source_quality:
+        # Re-encoding can't add fidelity; hand out the captured bytes as they are
+        return EncodedFrame(source, profile.mime_type, width, height)
+
+    if needs_resize:
+        height = round(height * profile.max_width / width)
+        width = profile.max_width
+        image.draft("RGB", (width, height))
+        image = image.convert("RGB").resize((width, height), Image.BILINEAR)
+    else:
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format=profile.format, quality=profile.quality)
+    return EncodedFrame(buffer.getvalue(), profile.mime_type, width, height)
+
+def _to_base64(data: bytes) -> str:
+    return base64.b64encode(data).decode('utf-8')
+
+class FrameEncoder:
+    """
+    Produces per-profile encodings of bus frames off the event loop.
+    Each (frame, profile) pair is encoded once, however many consumers ask.
+    """
+
+    def __init__(self, source_quality=80):
+        """
+        Args:
+            source_quality: JPEG quality the frames were captured at
+        """
+        self.source_quality = source_quality
+        self.encodes = 0
+
+    async def encode(self, frame, profile: EncodeProfile) -> EncodedFrame:
+        task = frame.encodings.get(profile.name)
+        if task is None:
+            task = asyncio.ensure_future(run_in_encoder(_encode, frame.data, self.source_quality, profile))
+            frame.encodings[profile.name] = task
+            self.encodes += 1
+        return await task
+
+    async def base64(self, encoded: EncodedFrame) -> str:
+        if encoded._base64 is None:
+            encoded._base64 = await run_in_encoder(_to_base64, encoded.data)
+        return encoded._base64
@@ -0,0 +1,53 @@
+# Binary framing for the frontend websocket
+# JSON stays for control messages; media travels as binary frames:
+#
+#   | version u8 | type u8 | flags u16 | seq u32 | timestamp_ms u64 | payload ... |
+#
+# All header fields are big-endian. Clients opt in with a "hello" handshake.
+
+import struct
+import time
+
+PROTOCOL_VERSION = 1
+
+HEADER = struct.Struct("!BBHIQ")
+HEADER_SIZE = HEADER.size
+
+# Message types
+VIDEO_FRAME = 1  # payload: raw JPEG bytes
+VIDEO_TILES = 2  # payload: dirty-region tiles, see services/tile_encoder.py
+AUDIO_INPUT = 3  # client -> server, payload: PCM16 mono at the rate announced in "hello"
+AUDIO_OUTPUT = 4  # server -> client, payload: PCM16 mono, 24 kHz
+
+def encode_message(msg_type: int, seq: int, payload: bytes, timestamp: float = None, flags: int = 0) -> bytes:
+    """
+    Build a binary websocket message.
+
+    Args:
+        msg_type: One of the message type constants
+        seq: Sequence number (wraps at 2**32)
+        payload: Raw payload bytes
+        timestamp: Seconds since the epoch (defaults to now)
+        flags: Type-specific flag bits
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    header = HEADER.pack(PROTOCOL_VERSION, msg_type, flags, seq & 0xFFFFFFFF, int(timestamp * 1000))
+    return header + payload
+
+def decode_message(data: bytes):
+    """
+    Parse a binary websocket message.
+
+    Returns:
+        (msg_type, seq, timestamp_ms, flags, payload)
+
+    Raises:
+        ValueError: If the message is truncated or uses an unknown version
+    """
+    if len(data) < HEADER_SIZE:
+        raise ValueError("Binary message shorter than header")
+    version, msg_type, flags, seq, timestamp_ms = HEADER.unpack_from(data)
+    if version != PROTOCOL_VERSION:
+        raise ValueError(f"Unsupported protocol version: {version}")
+    return msg_type, seq, timestamp_ms, flags, memoryview(data)[HEADER_SIZE:]
@@ -0,0 +1,294 @@
+# Network Policy - request blocking and a shared on-disk HTTP cache for demo browsing
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Third-party beacons that only slow pages down (and keep `networkidle` from settling)
+DEFAULT_BLOCKED_DOMAINS = [
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "segment.io",
+    "segment.com",
+    "hotjar.com",
+    "fullstory.com",
+    "mixpanel.com",
+    "amplitude.com",
+    "heap.io",
+    "clarity.ms",
+    "connect.facebook.net",
+    "bat.bing.com",
+    "sentry.io",
+    "newrelic.com",
+    "nr-data.net"
+]
+
+# Resource types worth caching across sessions
+CACHEABLE_RESOURCE_TYPES = {"stylesheet", "script", "font", "image"}
+
+# Headers that no longer describe the body once Playwright has decoded it
+HOP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+# Headers never replayed from the shared cache into another session
+PRIVATE_HEADERS = {"set-cookie", "set-cookie2"}
+
+# Request headers that make a response specific to one account
+CREDENTIAL_HEADERS = {"authorization", "cookie"}
+
+# Freshness for responses without Cache-Control or Expires, when there is no Last-Modified either
+FALLBACK_TTL = 300
+
+def _domain_matches(host: str, domains) -> bool:
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+class NetworkPolicy:
+    """
+    Per-product request filter.
+
+    - block_domains: requests to these domains (and subdomains) are aborted
+    - allow_domains: if set, only these domains are loaded
+    - block_resource_types: Playwright resource types to abort (e.g. "media")
+    """
+
+    def __init__(self, block_domains=None, allow_domains=None, block_resource_types=None):
+        self.block_domains = list(block_domains if block_domains is not None else DEFAULT_BLOCKED_DOMAINS)
+        self.allow_domains = list(allow_domains or [])
+        self.block_resource_types = set(block_resource_types or [])
+
+    @classmethod
+    def for_product(cls, product: dict = None, crawling: bool = False):
+        """
+        Build the policy from product["network_policy"], on top of the defaults.
+        The crawler additionally skips media, which never matters for training.
+        """
+        settings = (product or {}).get("network_policy") or {}
+        block_types = set(settings.get("block_resource_types", []))
+        if crawling:
+            block_types.add("media")
+        return cls(
+            block_domains=DEFAULT_BLOCKED_DOMAINS + settings.get("block_domains", []),
+            allow_domains=settings.get("allow_domains"),
+            block_resource_types=block_types
+        )
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if resource_type in self.block_resource_types:
+            return True
+        host = urlparse(url).hostname or ""
+        if not host:
+            return False  # data:, blob: and friends
+        if self.allow_domains and not _domain_matches(host, self.allow_domains):
+            return True
+        return _domain_matches(host, self.block_domains)
+
+class HttpCache:
+    """
+    Content cache for static assets, shared by every browser context.
+
+    Playwright disables Chromium's own HTTP cache once a route is installed,
+    so cacheable responses are stored here instead. The cache is keyed by
+    URL and shared by every product and session, so it only keeps responses
+    that are safe to hand to anyone: no no-cache/no-store/private, no Vary
+    on cookies, never Set-Cookie, and credentialed (Authorization or Cookie)
+    requests only when the response is explicitly Cache-Control: public.
+    Freshness follows max-age or Expires, else 10% of the Last-Modified
+    age (capped at default_ttl), else FALLBACK_TTL. The cache is trimmed
+    oldest-first when it grows past max_bytes.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, default_ttl: int = 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.size_bytes = None
+
+    def _paths(self, url: str):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.directory, key[:2], key)
+        return base + ".json", base + ".body"
+
+    @staticmethod
+    def _http_date(value):
+        try:
+            return parsedate_to_datetime(value).timestamp() if value else None
+        except (TypeError, ValueError):
+            return None
+
+    @classmethod
+    def ttl_for(cls, headers: dict, default_ttl: int, request_headers: dict = None):
+        """Seconds a response may be served from the shared cache, or None if it must not be stored."""
+        headers = {k.lower(): v for k, v in headers.items()}
+        cache_control = headers.get("cache-control", "").lower()
+        credentialed = any(k.lower() in CREDENTIAL_HEADERS for k in (request_headers or {}))
+        if credentialed and not re.search(r"\bpublic\b", cache_control):
+            return None
+        if any(directive in cache_control for directive in ("no-store", "no-cache", "private")):
+            return None
+        vary = headers.get("vary", "").lower()
+        if "*" in vary or "cookie" in vary or "authorization" in vary:
+            return None
+
+        match = re.search(r"max-age=(\d+)", cache_control)
+        if match:
+            return int(match.group(1)) or None
+
+        date = cls._http_date(headers.get("date")) or time.time()
+        expires = cls._http_date(headers.get("expires"))
+        if "expires" in headers:
+            # Invalid or past Expires means already stale
+            return int(expires - date) if expires and expires > date else None
+
+        last_modified = cls._http_date(headers.get("last-modified"))
+        if last_modified and last_modified < date:
+            return int(min(default_ttl, (date - last_modified) * 0.1)) or None
+        return min(default_ttl, FALLBACK_TTL)
+
+    def get(self, url: str):
+        """Return (status, headers, body) for a fresh entry, else None. Blocking I/O."""
+        meta_path, body_path = self._paths(url)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta["expires_at"] < time.time():
+                return None
+            with open(body_path, "rb") as f:
+                body = f.read()
+            os.utime(meta_path)  # Mark as recently used for eviction
+            headers = {k: v for k, v in meta["headers"].items() if k.lower() not in PRIVATE_HEADERS}
+            return meta["status"], headers, body
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def put(self, url: str, status: int, headers: dict, body: bytes, request_headers: dict = None):
+        """Store a response if it is cacheable. Blocking I/O."""
+        ttl = self.ttl_for(headers, self.default_ttl, request_headers)
+        if status != 200 or ttl is None or len(body) > self.max_bytes // 10:
+            return False
+
+        meta_path, body_path = self._paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        with open(body_path, "wb") as f:
+            f.write(body)
+        with open(meta_path, "w") as f:
+            json.dump({
+                "url": url,
+                "status": status,
+                "headers": {k: v for k, v in headers.items() if k.lower() not in HOP_HEADERS | PRIVATE_HEADERS},
+                "expires_at": time.time() + ttl
+            }, f)
+
+        if self.size_bytes is None:
+            self.size_bytes = self._disk_usage()
+        self.size_bytes += len(body)
+        if self.size_bytes > self.max_bytes:
+            self._evict()
+        return True
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"):
+                    meta_path = os.path.join(root, name)
+                    body_path = meta_path[:-5] + ".body"
+                    try:
+                        yield os.path.getmtime(meta_path), meta_path, body_path, os.path.getsize(body_path)
+                    except OSError:
+                        continue
+
+    def _disk_usage(self) -> int:
+        return sum(size for _, _, _, size in self._entries())
+
+    def _evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, _, _, size in entries)
+        target = int(self.max_bytes * 0.9)
+        for _, meta_path, body_path, size in entries:
+            if total <= target:
+                break
+            for path in (meta_path, body_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+        self.size_bytes = total
+
+class NetworkInterceptor:
+    """Applies a NetworkPolicy and the shared HttpCache to a browser context via context.route."""
+
+    def __init__(self, policy: NetworkPolicy, cache: HttpCache = None):
+        self.policy = policy
+        self.cache = cache
+
+        # Stats
+        self.requests = 0
+        self.blocked = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.bytes_from_cache = 0
+        self.bytes_fetched = 0
+
+    async def attach(self, context):
+        await context.route("**/*", self._handle_route)
+
+    async def _handle_route(self, route):
+        request = route.request
+        self.requests += 1
+
+        if self.policy.should_block(request.url, request.resource_type):
+            self.blocked += 1
+            await route.abort("blockedbyclient")
+            return
+
+        if not self.cache or request.method != "GET" or request.resource_type not in CACHEABLE_RESOURCE_TYPES:
+            await route.continue_()
+            return
+
+        cached = await asyncio.to_thread(self.cache.get, request.url)
+        if cached:
+            status, headers, body = cached
+            self.cache_hits += 1
+            self.bytes_from_cache += len(body)
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        self.cache_misses += 1
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception as e:
+            logger.debug(f"Fetch through cache failed for {request.url}: {e}")
+            await route.continue_()
+            return
+
+        self.bytes_fetched += len(body)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS}
+        await route.fulfill(status=response.status, headers=headers, body=body)
+        await asyncio.to_thread(
+            self.cache.put, request.url, response.status, response.headers, body, await request.all_headers()
+        )
+
+    def get_stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "blocked": self.blocked,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "bytes_saved": self.bytes_from_cache,
+            "bytes_fetched": self.bytes_fetched
+        }
+
+# Global cache instance, shared by live sessions and the crawler
+http_cache = HttpCache(config.HTTP_CACHE_DIR, config.HTTP_CACHE_MAX_MB * 1024 * 1024)
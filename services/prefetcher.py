@@ -0,0 +1,159 @@
+# Demo Prefetcher - preloads the next demo_script page while the agent is talking
+# A matching navigation swaps in the warm page instead of loading it cold
+
+import asyncio
+import logging
+from urllib.parse import urljoin, urldefrag
+
+logger = logging.getLogger(__name__)
+
+def _normalize(url: str) -> str:
+    return urldefrag(url or "")[0].rstrip("/")
+
+class DemoPrefetcher:
+    """
+    Follows the product's demo_script and keeps the next step's page loaded
+    in a hidden page of the session's browser context.
+
+    - take(url) hands out the warm page when the agent navigates to it
+    - a click that lands on the prefetched URL still benefits from the warm
+      asset cache and is counted as a cache hit
+    - pages that are replaced or closed unused count as wasted prefetches
+
+    Headless only: in a headed browser the hidden page is a visible tab that
+    steals focus from the buyer's page and may be throttled in the background.
+    """
+
+    def __init__(self, demo_script, element_map=None, base_url=None, delay=1.0, timeout_ms=15000):
+        """
+        Args:
+            demo_script: Product demo steps ({"action", "target" or "url", ...})
+            element_map: Crawled navigation elements (text -> {"href", ...})
+            base_url: Product URL that relative hrefs are resolved against
+            delay: Seconds to let the visible page settle before prefetching
+            timeout_ms: Give up on a prefetch that takes longer than this
+        """
+        self.element_map = {k.lower(): v for k, v in (element_map or {}).items()}
+        self.base_url = base_url
+        self.delay = delay
+        self.timeout_ms = timeout_ms
+        self.urls = [url for url in (self._step_url(step) for step in demo_script or []) if url]
+        self.position = -1
+        self.warm_page = None
+        self.warm_url = None
+        self.warm_bytes = 0
+        self.task = None
+
+        # Stats
+        self.prefetches = 0
+        self.hits = 0
+        self.cache_hits = 0
+        self.wasted = 0
+        self.wasted_bytes = 0
+        self.failures = 0
+
+    def _step_url(self, step):
+        if step.get("url"):
+            return urljoin(self.base_url or "", step["url"])
+        target = (step.get("target") or "").lower().strip()
+        if not target:
+            return None
+        entry = self.element_map.get(target)
+        if entry is None:
+            entry = next((v for k, v in self.element_map.items() if target in k), None)
+        if entry and entry.get("href"):
+            return urljoin(self.base_url or "", entry["href"])
+        return None
+
+    def next_url(self, current_url: str):
+        """The first demo step URL after the current page, or None at the end of the script."""
+        current = _normalize(current_url)
+        for index, url in enumerate(self.urls):
+            if _normalize(url) == current:
+                self.position = index
+        for url in self.urls[self.position + 1:]:
+            if _normalize(url) != current:
+                return url
+        return None
+
+    def schedule(self, context, current_page):
+        """Start (or restart) prefetching for the page the session just landed on."""
+        if self.task and not self.task.done():
+            self.task.cancel()
+        self.task = asyncio.create_task(self._prefetch(context, current_page))
+
+    async def _prefetch(self, context, current_page):
+        try:
+            await asyncio.sleep(self.delay)
+            url = self.next_url(current_page.url)
+            if url is None or (self.warm_page and _normalize(url) == _normalize(self.warm_url)):
+                return
+            await self.discard()
+
+            page = await context.new_page()
+            self.warm_page, self.warm_url, self.warm_bytes = page, url, 0
+            page.on("requestfinished", self._count_bytes)
+            self.prefetches += 1
+            await page.goto(url, wait_until="domcontentloaded", timeout=self.timeout_ms)
+            logger.info(f"Prefetched {url}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            logger.debug(f"Prefetch failed: {e}")
+
+    async def _count_bytes(self, request):
+        try:
+            sizes = await request.sizes()
+            self.warm_bytes += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        except Exception:
+            pass
+
+    def take(self, url: str):
+        """Return the warm page if it was prefetched for this URL, else None."""
+        if not self.warm_page or _normalize(url) != _normalize(self.warm_url):
+            return None
+        page = self.warm_page
+        page.remove_listener("requestfinished", self._count_bytes)
+        self.warm_page = self.warm_url = None
+        self.hits += 1
+        return page
+
+    async def note_navigation(self, url: str):
+        """The visible page navigated on its own (e.g. a clicked link)."""
+        if self.warm_page and _normalize(url) == _normalize(self.warm_url):
+            # Assets are already in the shared cache; the hidden copy is no longer needed
+            self.cache_hits += 1
+            page = self.warm_page
+            self.warm_page = self.warm_url = None
+            await page.close()
+
+    async def discard(self):
+        """Close the warm page without using it."""
+        if not self.warm_page:
+            return
+        page = self.warm_page
+        self.warm_page = self.warm_url = None
+        self.wasted += 1
+        self.wasted_bytes += self.warm_bytes
+        try:
+            await page.close()
+        except Exception as e:
+            logger.debug(f"Closing prefetched page failed: {e}")
+
+    async def close(self):
+        if self.task and not self.task.done():
+            self.task.cancel()
+        await self.discard()
+
+    def get_stats(self) -> dict:
+        return {
+            "script_urls": len(self.urls),
+            "prefetches": self.prefetches,
+            "hits": self.hits,
+            "cache_hits": self.cache_hits,
+            "hit_rate": (self.hits + self.cache_hits) / self.prefetches if self.prefetches else 0.0,
+            "wasted": self.wasted,
+            "wasted_bytes": self.wasted_bytes,
+            "failures": self.failures
+        }
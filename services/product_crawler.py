@@ -4,11 +4,36 @@
 from playwright.async_api import async_playwright, Page
 from services.vision_analyzer import VisionAnalyzer
 from services.database import db
+from services.storage_state import storage_state_store
+from services.network_policy import NetworkPolicy, NetworkInterceptor, http_cache
+from config import config
 import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
 
+async def login_to_product(page: Page, url: str, credentials: dict):
+    """
+    Navigate to the product and log in with the seller's credentials.
+    Shared by training and by live sessions whose login snapshot expired.
+    """
+    logger.info(f"Navigating to {url}")
+    await page.goto(url)
+    await page.wait_for_load_state("networkidle")
+    
+    # TODO: Implement smart login detection
+    # In production, use Vision API to find login form
+    password_field = page.locator("input[type='password']").first
+    if not credentials or await password_field.count() == 0:
+        return
+    
+    username_field = page.locator("input[type='email'], input[type='text'], input:not([type])").first
+    if credentials.get("username") and await username_field.count() > 0:
+        await username_field.fill(credentials["username"])
+    await password_field.fill(credentials.get("password", ""))
+    await password_field.press("Enter")
+    await page.wait_for_load_state("networkidle")
+
 class ProductCrawler:
     """
     Crawls a product website to learn its structure.
@@ -46,10 +71,19 @@ class ProductCrawler:
             
             async with async_playwright() as p:
                 browser = await p.chromium.launch(headless=True)
-                page = await browser.new_page()
+                context = await browser.new_context()
+                if config.NETWORK_POLICY_ENABLED:
+                    # Skip trackers so `networkidle` settles, reuse cached assets across retrains
+                    product = await db.get_product(product_id)
+                    interceptor = NetworkInterceptor(NetworkPolicy.for_product(product, crawling=True), http_cache)
+                    await interceptor.attach(context)
+                page = await context.new_page()
                 
                 # Step 1: Login
                 await self._login(page, url, credentials)
+                
+                # Snapshot the authenticated state so live sessions skip the login
+                storage_state_store.save(product_id, await context.storage_state(), start_url=page.url)
                 await db.set_training_progress(product_id, {
                     "progress": 30,
                     "current_step": "Logged in successfully"
@@ -100,13 +134,7 @@ class ProductCrawler:
     
     async def _login(self, page: Page, url: str, credentials: dict):
         """Navigate to URL and login."""
-        logger.info(f"Navigating to {url}")
-        await page.goto(url)
-        await page.wait_for_load_state("networkidle")
-        
-        # TODO: Implement smart login detection
-        # For now, assume credentials are provided
-        # In production, use Vision API to find login form
+        await login_to_product(page, url, credentials)
         
     async def _map_navigation(self, page: Page, product_id: str):
         """Map all clickable navigation elements."""
@@ -137,7 +165,7 @@ class ProductCrawler:
         screenshot = await page.screenshot(type='jpeg', quality=80)
         
         # Analyze with Vision API
-        analysis = await self.vision_analyzer.analyze_screenshot(screenshot)
+        analysis = await self.vision_analyzer.analyze_screenshot(screenshot, product_id)
         
         # Store analysis results
         # TODO: Implement full vision analysis
@@ -2,99 +2,416 @@ import asyncio
 import aiohttp
 import json
 import logging
+import random
+import time
+import uuid
+from collections import deque
 from config import config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Outbound lanes, drained in this order by the single writer task
+PRIORITY_CONTROL = 0  # Tool outputs, response.create, session.update
+PRIORITY_AUDIO = 1
+PRIORITY_IMAGE = 2
+
+AGENT_INSTRUCTIONS = "You are Aura, an AI sales agent. You can control the browser."
+
+def realtime_url():
+    # Format: wss://{endpoint}/openai/realtime?api-version={version}&deployment={deployment}
+    # Note: endpoint usually starts with https://, need to replace with wss:// or just use host
+    host = config.AZURE_OPENAI_ENDPOINT.replace("https://", "").replace("http://", "").rstrip("/")
+    return f"wss://{host}/openai/realtime?api-version={config.AZURE_OPENAI_API_VERSION}&deployment={config.AZURE_OPENAI_DEPLOYMENT}"
+
+def realtime_headers():
+    return {
+        "api-key": config.AZURE_OPENAI_API_KEY,
+        "OpenAI-Beta": "realtime=v1"
+    }
+
+def session_update_event():
+    from tools.definitions import tools
+    session = {
+        "instructions": AGENT_INSTRUCTIONS,
+        "tools": tools,
+        "tool_choice": "auto",
+    }
+    # Without this the server never sends input_audio_transcription events and
+    # the reconnect summary only has the assistant's side of the conversation
+    if config.REALTIME_TRANSCRIPTION_MODEL:
+        session["input_audio_transcription"] = {"model": config.REALTIME_TRANSCRIPTION_MODEL}
+    return {
+        "type": "session.update",
+        "session": session
+    }
+
 class RealtimeClient:
-    def __init__(self):
+    def __init__(self, max_audio_backlog=500, max_context_images=None, summarize_evicted=None,
+                 pool=None, reconnect_max_delay=None, transcript_lines=30):
+        """
+        Args:
+            max_audio_backlog: Audio chunks kept while the socket is stalled
+            max_context_images: Screenshots kept in the conversation (VISION_MAX_CONTEXT_IMAGES)
+            summarize_evicted: Replace evicted screenshots with a caption (VISION_EVICTION_SUMMARY)
+            pool: Running RealtimeConnectionPool to take a pre-configured socket from
+            reconnect_max_delay: Upper bound of the reconnect backoff in seconds
+            transcript_lines: Recent conversation lines replayed after a reconnect
+        """
         self.endpoint = config.AZURE_OPENAI_ENDPOINT
         self.api_key = config.AZURE_OPENAI_API_KEY
         self.deployment = config.AZURE_OPENAI_DEPLOYMENT
         self.api_version = config.AZURE_OPENAI_API_VERSION
         self.ws = None
         self.on_tool_call_callback = None
-    
-    def set_on_tool_call(self, callback):
-        self.on_tool_call_callback = callback
+        self.on_tool_call_delta_callback = None
+        self.on_audio_delta_callback = None
+        self.on_speech_started_callback = None
+        self.on_response_done_callback = None
+        self.on_audio_done_callback = None
+        self.on_session_reset_callback = None
+        self.active_response_id = None
+        self.audio_item = None  # (item_id, content_index) of the reply currently being spoken
+        self.call_names = {}  # call_id -> function name, known before the arguments stream
+        self.session_calls = set()  # call_ids issued on the current socket and not yet answered
+        self.pool = pool
+        self.reconnect_max_delay = reconnect_max_delay or config.REALTIME_RECONNECT_MAX_DELAY
+        self.closing = False
+        self.connects = 0
+        self.reconnects = 0
+        self.pooled_connects = 0
+        self.transcript = deque(maxlen=transcript_lines)
         
-    async def connect(self):
-        # Construct WebSocket URL
-        # Format: wss://{endpoint}/openai/realtime?api-version={version}&deployment={deployment}
-        # Note: endpoint usually starts with https://, need to replace with wss:// or just use host
+        # Single-writer send queue: control and audio are FIFO lanes, images
+        # keep only the newest pending frame (older ones are superseded)
+        self.control_queue = deque()
+        self.audio_queue = deque(maxlen=max_audio_backlog)
+        self.pending_image = None
+        self.send_ready = asyncio.Event()
+        self.writer_task = None
         
-        host = self.endpoint.replace("https://", "").replace("http://", "").rstrip("/")
-        url = f"wss://{host}/openai/realtime?api-version={self.api_version}&deployment={self.deployment}"
+        # Send stats
+        self.sent = {PRIORITY_CONTROL: 0, PRIORITY_AUDIO: 0, PRIORITY_IMAGE: 0}
+        self.images_superseded = 0
+        self.audio_dropped = 0
+        self.send_latency_ms = []
         
-        headers = {
-            "api-key": self.api_key,
-            "OpenAI-Beta": "realtime=v1"
+        # Screenshots currently in the model's context, oldest first: (item_id, caption)
+        self.max_context_images = max_context_images if max_context_images is not None else config.VISION_MAX_CONTEXT_IMAGES
+        self.summarize_evicted = summarize_evicted if summarize_evicted is not None else config.VISION_EVICTION_SUMMARY
+        self.context_images = deque()
+        self.image_captions = {}
+        self.images_evicted = 0
+    
+    def set_on_tool_call(self, callback):
+        self.on_tool_call_callback = callback
+
+    def set_on_audio_delta(self, callback):
+        """Register callback(audio_base64, item_id) for the model's streamed speech (PCM16, 24 kHz)."""
+        self.on_audio_delta_callback = callback
+
+    def set_on_audio_done(self, callback):
+        """Register callback(item_id) for the end of a reply's audio (response.audio.done)."""
+        self.on_audio_done_callback = callback
+
+    def set_on_speech_started(self, callback):
+        """Register callback() for server-side VAD detecting buyer speech."""
+        self.on_speech_started_callback = callback
+
+    def set_on_response_done(self, callback):
+        """Register callback(response_id, status) for response.done ("completed", "cancelled", ...)."""
+        self.on_response_done_callback = callback
+
+    def set_on_session_reset(self, callback):
+        """
+        Register callback() for a reconnect: responses and calls in flight on
+        the old socket will never get response.done.
+        """
+        self.on_session_reset_callback = callback
+
+    def is_responding(self) -> bool:
+        return self.active_response_id is not None or self.audio_item is not None
+
+    def interrupt(self, played_ms):
+        """
+        Barge-in: cancel the in-flight response and cut the spoken reply at
+        what the buyer actually heard, so the model's context matches reality.
+        """
+        if self.active_response_id:
+            self.enqueue({"type": "response.cancel"}, front=True)
+            self.active_response_id = None
+        if self.audio_item:
+            item_id, content_index = self.audio_item
+            self.enqueue({
+                "type": "conversation.item.truncate",
+                "item_id": item_id,
+                "content_index": content_index,
+                "audio_end_ms": int(played_ms)
+            })
+            self.audio_item = None
+
+    def set_on_tool_call_delta(self, callback):
+        """Register callback(call_id, name, delta, response_id) for streamed function-call arguments."""
+        self.on_tool_call_delta_callback = callback
+
+    def enqueue(self, event, priority=PRIORITY_CONTROL, front=False):
+        """
+        Queue an event for the writer task. Never blocks; a stalled socket
+        only grows the control lane, while images are coalesced to the newest.
+        `front` puts a control event ahead of everything already queued.
+        """
+        entry = (priority, event, time.perf_counter())
+        if priority == PRIORITY_IMAGE:
+            if self.pending_image is not None:
+                self.images_superseded += 1
+                self.image_captions.pop(self.pending_image[1]["item"]["id"], None)
+            self.pending_image = entry
+        elif priority == PRIORITY_AUDIO:
+            if len(self.audio_queue) == self.audio_queue.maxlen:
+                self.audio_dropped += 1
+            self.audio_queue.append(entry)
+        elif front:
+            self.control_queue.appendleft(entry)
+        else:
+            self.control_queue.append(entry)
+        self.send_ready.set()
+
+    def _next_outbound(self):
+        if self.control_queue:
+            return self.control_queue.popleft()
+        if self.audio_queue:
+            return self.audio_queue.popleft()
+        entry, self.pending_image = self.pending_image, None
+        return entry
+
+    def _requeue(self, entry):
+        """Put back an event the writer could not send, ahead of newer ones."""
+        priority = entry[0]
+        if priority == PRIORITY_IMAGE:
+            if self.pending_image is None:
+                self.pending_image = entry
+        elif priority == PRIORITY_AUDIO:
+            self.audio_queue.appendleft(entry)
+        else:
+            self.control_queue.appendleft(entry)
+
+    async def _writer_loop(self, ws):
+        """The only coroutine that writes to the socket."""
+        while True:
+            await self.send_ready.wait()
+            entry = self._next_outbound()
+            if entry is None:
+                self.send_ready.clear()
+                continue
+            
+            priority, event, queued_at = entry
+            try:
+                await ws.send_json(event)
+            except Exception as e:
+                logger.error(f"Send failed, keeping {event.get('type')} queued: {e}")
+                self._requeue(entry)
+                return
+            
+            self.sent[priority] += 1
+            if priority == PRIORITY_IMAGE:
+                self._on_image_sent(event)
+            self.send_latency_ms.append((time.perf_counter() - queued_at) * 1000)
+            if len(self.send_latency_ms) > 200:
+                self.send_latency_ms.pop(0)
+
+    def _on_image_sent(self, event):
+        """Track the image now in the conversation and evict the oldest beyond the limit."""
+        item_id = event["item"]["id"]
+        self.context_images.append((item_id, self.image_captions.pop(item_id, None)))
+        while len(self.context_images) > self.max_context_images:
+            item_id, caption = self.context_images.popleft()
+            if self.summarize_evicted and caption:
+                # Keep a one-line trace of the screen where the image used to be
+                self.enqueue({
+                    "type": "conversation.item.create",
+                    "previous_item_id": item_id,
+                    "item": {
+                        "type": "message",
+                        "role": "user",
+                        "content": [{"type": "input_text", "text": f"[Earlier screen: {caption}]"}]
+                    }
+                })
+            self.enqueue({"type": "conversation.item.delete", "item_id": item_id})
+            self.images_evicted += 1
+
+    def get_stats(self) -> dict:
+        latencies = sorted(self.send_latency_ms)
+        return {
+            "queue_depth": {
+                "control": len(self.control_queue),
+                "audio": len(self.audio_queue),
+                "image": 1 if self.pending_image else 0
+            },
+            "sent": {
+                "control": self.sent[PRIORITY_CONTROL],
+                "audio": self.sent[PRIORITY_AUDIO],
+                "image": self.sent[PRIORITY_IMAGE]
+            },
+            "images_superseded": self.images_superseded,
+            "audio_dropped": self.audio_dropped,
+            "context_images": len(self.context_images),
+            "images_evicted": self.images_evicted,
+            "connects": self.connects,
+            "reconnects": self.reconnects,
+            "pooled_connects": self.pooled_connects,
+            "avg_send_latency_ms": sum(latencies) / len(latencies) if latencies else None,
+            "p95_send_latency_ms": latencies[int(len(latencies) * 0.95)] if latencies else None
         }
         
-        logger.info(f"Connecting to {url}...")
-        print(f"DEBUG: Connecting to URL: {url}")
-        
-        async with aiohttp.ClientSession() as session:
+    async def connect(self):
+        """
+        Keep a Realtime session up until close(): reconnects with jittered
+        exponential backoff and rehydrates the session on every new socket.
+        """
+        attempt = 0
+        while not self.closing:
+            connected_at = None
             try:
-                async with session.ws_connect(url, headers=headers) as ws:
-                    self.ws = ws
-                    logger.info("Connected to Azure OpenAI Realtime API!")
-                    
-                    # Send initial configuration or greeting
-                    await self.send_initial_message()
-                    
-                    # Listen for messages
-                    async for msg in ws:
-                        if msg.type == aiohttp.WSMsgType.TEXT:
-                            data = json.loads(msg.data)
-                            await self.handle_message(data)
-                        elif msg.type == aiohttp.WSMsgType.ERROR:
-                            logger.error("WebSocket connection closed with error %s", ws.exception())
+                session, ws, preconfigured = await self._open()
+                connected_at = time.monotonic()
+                await self._run(session, ws, preconfigured)
             except Exception as e:
                 logger.error(f"Connection failed: {e}")
+            
+            if self.closing:
+                break
+            if connected_at and time.monotonic() - connected_at > 60:
+                attempt = 0  # The last connection was healthy; start the backoff over
+            delay = min(self.reconnect_max_delay, 2 ** attempt) * random.uniform(0.5, 1.0)
+            attempt += 1
+            logger.warning(f"Realtime connection lost, reconnecting in {delay:.1f}s (attempt {attempt})")
+            await asyncio.sleep(delay)
 
-    async def send_initial_message(self):
-        from tools.definitions import tools
-        # Session update with tools
-        session_update = {
-            "type": "session.update",
-            "session": {
-                "tools": tools,
-                "tool_choice": "auto",
-            }
-        }
-        await self.ws.send_json(session_update)
+    async def _open(self):
+        """Returns (client session, websocket, session.update already sent)."""
+        pooled = await self.pool.acquire() if self.pool else None
+        if pooled:
+            self.pooled_connects += 1
+            session, ws = pooled
+            return session, ws, True
         
-        # Trigger a simple response
+        url = realtime_url()
+        logger.info(f"Connecting to {url}...")
+        session = aiohttp.ClientSession()
+        try:
+            ws = await session.ws_connect(url, headers=realtime_headers())
+        except Exception:
+            await session.close()
+            raise
+        return session, ws, False
+
+    async def _run(self, session, ws, preconfigured):
+        try:
+            self.ws = ws
+            self.prepare_session(preconfigured)
+            self.writer_task = asyncio.create_task(self._writer_loop(ws))
+            logger.info("Connected to Azure OpenAI Realtime API!")
+            
+            # Listen for messages
+            async for msg in ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    data = json.loads(msg.data)
+                    await self.handle_message(data)
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    logger.error("WebSocket connection closed with error %s", ws.exception())
+        finally:
+            self.ws = None
+            if self.writer_task:
+                self.writer_task.cancel()
+                self.writer_task = None
+            await ws.close()
+            await session.close()
+
+    def prepare_session(self, preconfigured=False):
+        """
+        Queue the setup for a new socket. The first connection greets the buyer;
+        a reconnect replays the session config and a summary of the conversation.
+        """
+        if self.connects:
+            self.reconnects += 1
+            # Queued control events (tool outputs, deletes) refer to the old conversation
+            dropped = len(self.control_queue)
+            self.control_queue.clear()
+            self.context_images.clear()
+            # Nothing from the dead socket can be cancelled or truncated any more
+            self.active_response_id = None
+            self.audio_item = None
+            self.call_names.clear()
+            self.session_calls.clear()
+            logger.info(f"Rehydrating Realtime session (dropped {dropped} stale events)")
+            if self.transcript:
+                self.enqueue({
+                    "type": "conversation.item.create",
+                    "item": {
+                        "type": "message",
+                        "role": "user",
+                        "content": [{"type": "input_text", "text": self.conversation_summary()}]
+                    }
+                })
+            if self.on_session_reset_callback:
+                self.on_session_reset_callback()
+        else:
+            self.send_initial_message()
+        
+        if not preconfigured:
+            self.enqueue(session_update_event(), front=True)
+        self.connects += 1
+
+    def conversation_summary(self):
+        lines = "\n".join(self.transcript)
+        return (
+            "[The connection was interrupted and has been restored. "
+            f"Conversation so far, continue from here without greeting again:]\n{lines}"
+        )
+
+    def record_transcript(self, line):
+        self.transcript.append(line if len(line) <= 300 else line[:297] + "...")
+
+    def send_initial_message(self):
+        # Trigger a simple response (session.update is queued ahead of it)
         event = {
             "type": "response.create",
             "response": {
                 "modalities": ["text", "audio"],
-                "instructions": "You are Aura, an AI sales agent. You can control the browser. Say hello and ask what I would like to see."
+                "instructions": f"{AGENT_INSTRUCTIONS} Say hello and ask what I would like to see."
             }
         }
-        await self.ws.send_json(event)
+        self.enqueue(event)
 
-    async def send_tool_output(self, call_id, output):
+    async def send_tool_output(self, call_id, output, trigger_response=True):
         logger.info(f"Sending tool output for {call_id}: {output}")
-        event = {
-            "type": "conversation.item.create",
-            "item": {
-                "type": "function_call_output",
-                "call_id": call_id,
-                "output": output
+        self.record_transcript(f"Tool result: {output}")
+        if call_id in self.session_calls:
+            self.session_calls.discard(call_id)
+            item = {"type": "function_call_output", "call_id": call_id, "output": output}
+        else:
+            # The call was made before a reconnect; the new conversation has no such call_id
+            item = {
+                "type": "message",
+                "role": "user",
+                "content": [{"type": "input_text", "text": f"[Result of a tool call made before the reconnect: {output}]"}]
             }
-        }
-        await self.ws.send_json(event)
+        self.enqueue({"type": "conversation.item.create", "item": item})
         
         # Trigger response after tool output
-        await self.ws.send_json({"type": "response.create"})
+        if trigger_response:
+            self.request_response()
+
+    def request_response(self):
+        """Ask the model for its next response (e.g. once every tool output is in)."""
+        self.enqueue({"type": "response.create"})
 
-    async def send_image(self, image_base64):
+    async def send_image(self, image_base64, mime_type="image/jpeg", caption=None):
         """
         Send a screenshot to OpenAI for vision analysis.
         This enables the AI to "see" the current browser state.
+        Only the last max_context_images screenshots stay in the conversation;
+        `caption` (e.g. page title and URL) replaces an evicted image as text.
         """
         logger.info("Sending screenshot to OpenAI for vision analysis")
         
@@ -102,29 +419,70 @@ class RealtimeClient:
         event = {
             "type": "conversation.item.create",
             "item": {
+                "id": f"img_{uuid.uuid4().hex[:24]}",
                 "type": "message",
                 "role": "user",
                 "content": [
                     {
                         "type": "input_image",
-                        "image": f"data:image/jpeg;base64,{image_base64}"
+                        "image": f"data:{mime_type};base64,{image_base64}"
                     }
                 ]
             }
         }
-        await self.ws.send_json(event)
+        if caption:
+            self.image_captions[event["item"]["id"]] = caption
+        
+        # A newer screenshot replaces this one if it is still waiting to be sent
+        self.enqueue(event, PRIORITY_IMAGE)
         
         # Optionally trigger a response to get AI's interpretation
-        # await self.ws.send_json({"type": "response.create"})
+        # self.enqueue({"type": "response.create"})
+
+    async def send_audio(self, audio_base64):
+        """Append a base64 PCM16 chunk to the input audio buffer."""
+        self.enqueue({"type": "input_audio_buffer.append", "audio": audio_base64}, PRIORITY_AUDIO)
 
     async def handle_message(self, data):
         event_type = data.get("type")
         
         if event_type == "response.text.delta":
             print(f"AI: {data.get('delta')}", end="", flush=True)
+        elif event_type == "response.created":
+            self.active_response_id = (data.get("response") or {}).get("id")
+        elif event_type == "response.audio.delta":
+            if data.get("response_id") and data.get("response_id") != self.active_response_id:
+                return  # Late delta from a response we already cancelled
+            self.audio_item = (data.get("item_id"), data.get("content_index", 0))
+            if self.on_audio_delta_callback:
+                self.on_audio_delta_callback(data.get("delta", ""), data.get("item_id"))
+        elif event_type == "response.audio.done":
+            if data.get("response_id") and data.get("response_id") != self.active_response_id:
+                return  # A cancelled response; its playback was already flushed
+            if self.on_audio_done_callback:
+                self.on_audio_done_callback(data.get("item_id"))
+        elif event_type == "input_audio_buffer.speech_started":
+            if self.on_speech_started_callback:
+                self.on_speech_started_callback()
         elif event_type == "response.audio.transcript.delta":
             # For audio transcript (input or output)
             pass
+        elif event_type == "response.audio_transcript.done":
+            self.record_transcript(f"Assistant: {data.get('transcript', '')}")
+        elif event_type == "response.text.done":
+            self.record_transcript(f"Assistant: {data.get('text', '')}")
+        elif event_type == "conversation.item.input_audio_transcription.completed":
+            self.record_transcript(f"Buyer: {data.get('transcript', '')}")
+        elif event_type == "response.output_item.added":
+            item = data.get("item") or {}
+            if item.get("type") == "function_call":
+                self.call_names[item.get("call_id")] = item.get("name")
+        elif event_type == "response.function_call_arguments.delta":
+            if self.on_tool_call_delta_callback:
+                call_id = data.get("call_id")
+                self.on_tool_call_delta_callback(
+                    call_id, self.call_names.get(call_id), data.get("delta", ""), data.get("response_id")
+                )
         elif event_type == "response.function_call_arguments.done":
             # Call ID, name, and arguments are in this event roughly or we accumulate from deltas.
             # Actually, per OpenAI Realtime spec, we might watch for item.created (function_call) 
@@ -133,16 +491,26 @@ class RealtimeClient:
             call_id = data.get("call_id")
             name = data.get("name")
             args = data.get("arguments")
+            response_id = data.get("response_id")
+            self.call_names.pop(call_id, None)
+            self.session_calls.add(call_id)
+            self.record_transcript(f"Tool call: {name}({args})")
             
             if self.on_tool_call_callback:
                 # Run in background to not block WS loop
-                asyncio.create_task(self.on_tool_call_callback(call_id, name, args))
+                asyncio.create_task(self.on_tool_call_callback(call_id, name, args, response_id))
 
         elif event_type == "response.done":
+            response = data.get("response") or {}
+            if response.get("id") == self.active_response_id:
+                self.active_response_id = None
+            if self.on_response_done_callback:
+                self.on_response_done_callback(response.get("id"), response.get("status"))
             print("\n[Response Complete]")
         elif event_type == "error":
             logger.error(f"Error from API: {data}")
 
     async def close(self):
+        self.closing = True
         if self.ws:
             await self.ws.close()
@@ -0,0 +1,147 @@
+# Realtime Pool - pre-connected, pre-configured Realtime API sockets
+# New sessions skip DNS, TLS and the websocket handshake
+
+import asyncio
+import logging
+import time
+import aiohttp
+from config import config
+from services.realtime_client import realtime_url, realtime_headers, session_update_event
+
+logger = logging.getLogger(__name__)
+
+class PooledConnection:
+    def __init__(self, session, ws):
+        self.session = session
+        self.ws = ws
+        self.opened_at = time.monotonic()
+
+    def is_usable(self, max_idle: float) -> bool:
+        return not self.ws.closed and time.monotonic() - self.opened_at < max_idle
+
+    async def close(self):
+        try:
+            await self.ws.close()
+        finally:
+            await self.session.close()
+
+class RealtimeConnectionPool:
+    """
+    Keeps `size` Realtime sockets open with session.update (tools and
+    instructions) already sent.
+
+    - acquire() hands out a socket and triggers a background refill
+    - Idle sockets are closed after max_idle seconds, before the service drops them
+    """
+
+    def __init__(self, size=2, max_idle=240, refill_interval=10):
+        self.size = size
+        self.max_idle = max_idle
+        self.refill_interval = refill_interval
+        self.idle = []
+        self.is_running = False
+        self._refill = asyncio.Event()
+        self._task = None
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.opened = 0
+        self.expired = 0
+        self.connect_ms = []
+
+    async def start(self):
+        if self.is_running:
+            return
+        logger.info(f"Starting Realtime connection pool ({self.size} sockets)...")
+        self.is_running = True
+        await self._fill()
+        self._task = asyncio.create_task(self._maintain_loop())
+        logger.info("Realtime connection pool ready.")
+
+    async def _open(self) -> PooledConnection:
+        started = time.perf_counter()
+        session = aiohttp.ClientSession()
+        try:
+            ws = await session.ws_connect(realtime_url(), headers=realtime_headers())
+            await ws.send_json(session_update_event())
+        except Exception:
+            await session.close()
+            raise
+        self.opened += 1
+        self.connect_ms.append((time.perf_counter() - started) * 1000)
+        if len(self.connect_ms) > 100:
+            self.connect_ms.pop(0)
+        return PooledConnection(session, ws)
+
+    async def _fill(self):
+        for connection in [c for c in self.idle if not c.is_usable(self.max_idle)]:
+            self.idle.remove(connection)
+            self.expired += 1
+            await connection.close()
+
+        missing = self.size - len(self.idle)
+        if missing <= 0:
+            return
+        results = await asyncio.gather(*(self._open() for _ in range(missing)), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.error(f"Realtime pre-connect failed: {result}")
+            else:
+                self.idle.append(result)
+
+    async def _maintain_loop(self):
+        while self.is_running:
+            try:
+                await asyncio.wait_for(self._refill.wait(), timeout=self.refill_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._refill.clear()
+            try:
+                await self._fill()
+            except Exception as e:
+                logger.error(f"Realtime pool refill failed: {e}")
+
+    async def acquire(self):
+        """
+        Returns:
+            (aiohttp session, websocket) ready for use, or None when the pool is empty
+        """
+        while self.idle:
+            connection = self.idle.pop(0)
+            if connection.is_usable(self.max_idle):
+                self.hits += 1
+                self._refill.set()
+                return connection.session, connection.ws
+            self.expired += 1
+            await connection.close()
+        self.misses += 1
+        self._refill.set()
+        return None
+
+    async def stop(self):
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+        for connection in self.idle:
+            try:
+                await connection.close()
+            except Exception:
+                pass
+        self.idle = []
+        logger.info("Realtime connection pool stopped.")
+
+    def get_stats(self) -> dict:
+        requests = self.hits + self.misses
+        return {
+            "idle": len(self.idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / requests if requests else 0.0,
+            "opened": self.opened,
+            "expired": self.expired,
+            "avg_connect_ms": sum(self.connect_ms) / len(self.connect_ms) if self.connect_ms else None
+        }
+
+# Global pool instance (started by the websocket server when REALTIME_POOL_SIZE > 0)
+realtime_pool = RealtimeConnectionPool(size=config.REALTIME_POOL_SIZE)
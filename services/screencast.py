@@ -0,0 +1,79 @@
+import asyncio
+import base64
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ScreencastCapture:
+    """
+    Capture backend built on Chromium's DevTools screencast.
+
+    Chromium pushes a JPEG through the CDP session whenever the page repaints.
+    The latest frame is kept in memory, so readers never trigger a new capture.
+    """
+
+    def __init__(self, quality=50, max_width=None, max_height=None):
+        self.quality = quality
+        self.max_width = max_width
+        self.max_height = max_height
+        self.cdp = None
+        self.latest_frame = None
+        self.latest_timestamp = None
+        self.frames_received = 0
+        self.on_frame_callback = None
+
+    def set_on_frame(self, callback):
+        """Register a callback invoked (without arguments) when a new frame arrives."""
+        self.on_frame_callback = callback
+
+    async def start(self, context, page):
+        """Open a CDP session on the page and start the screencast."""
+        self.cdp = await context.new_cdp_session(page)
+        self.cdp.on("Page.screencastFrame", self._on_screencast_frame)
+
+        params = {"format": "jpeg", "quality": self.quality}
+        if self.max_width:
+            params["maxWidth"] = self.max_width
+        if self.max_height:
+            params["maxHeight"] = self.max_height
+
+        await self.cdp.send("Page.startScreencast", params)
+        logger.info("Screencast started")
+
+    def _on_screencast_frame(self, params):
+        self.latest_frame = base64.b64decode(params["data"])
+        self.latest_timestamp = params.get("metadata", {}).get("timestamp")
+        self.frames_received += 1
+
+        # Chromium stops sending frames until the previous one is acknowledged
+        asyncio.create_task(self._ack(params["sessionId"]))
+
+        if self.on_frame_callback:
+            self.on_frame_callback()
+
+    async def _ack(self, session_id):
+        try:
+            await self.cdp.send("Page.screencastFrameAck", {"sessionId": session_id})
+        except Exception as e:
+            logger.debug(f"Screencast ack failed: {e}")
+
+    def get_latest_frame(self):
+        """Return the most recent JPEG frame, or None before the first paint."""
+        return self.latest_frame
+
+    async def stop(self):
+        if not self.cdp:
+            return
+        try:
+            await self.cdp.send("Page.stopScreencast")
+            await self.cdp.detach()
+        except Exception as e:
+            logger.debug(f"Screencast stop failed: {e}")
+        self.cdp = None
+        logger.info("Screencast stopped")
+
+    def get_stats(self) -> dict:
+        return {
+            "frames_received": self.frames_received,
+            "latest_timestamp": self.latest_timestamp
+        }
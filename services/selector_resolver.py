@@ -0,0 +1,184 @@
+# Selector Resolver - turns the model's selector strings into Playwright locators
+# Races several interpretations at once and remembers which one worked
+
+import asyncio
+import logging
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Roles the model usually means when it names something to click
+CLICKABLE_ROLES = ("button", "link", "menuitem", "tab", "checkbox", "option")
+
+def url_pattern(url: str) -> str:
+    """Collapse ids in a URL path so /projects/42 and /projects/43 share cache entries."""
+    parsed = urlparse(url or "")
+    path = re.sub(r"/(\d+|[0-9a-fA-F-]{16,})(?=/|$)", "/*", parsed.path)
+    return f"{parsed.netloc}{path}"
+
+class StrategyCache:
+    """LRU map of (product, URL pattern, selector) -> winning strategy name."""
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        strategy = self.entries.get(key)
+        if strategy is not None:
+            self.entries.move_to_end(key)
+        return strategy
+
+    def put(self, key, strategy):
+        self.entries[key] = strategy
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self.entries.pop(key, None)
+
+# Shared across sessions so every buyer benefits from earlier resolutions
+shared_strategy_cache = StrategyCache()
+
+class SelectorResolver:
+    """
+    Resolves a selector string against the current page.
+
+    Text, CSS, ARIA-role and element_map interpretations are tried concurrently;
+    the first visible match wins and its strategy is cached per
+    (product, URL pattern, selector) so repeat actions skip the race.
+    """
+
+    def __init__(self, timeout_ms=3000, cache=None):
+        self.timeout_ms = timeout_ms
+        self.cache = cache or shared_strategy_cache
+        self.product_id = None
+        self.element_map = {}
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.wins = {}
+        self.resolve_ms = []
+
+    def set_product(self, product_id: str, element_map: dict):
+        self.product_id = product_id
+        self.element_map = {k.lower(): v for k, v in (element_map or {}).items()}
+
+    def _candidate(self, page, strategy: str, selector: str):
+        """Build the locator for one strategy, or None if it doesn't apply."""
+        if strategy == "css":
+            return page.locator(selector)
+
+        if strategy == "text":
+            if selector.startswith("text="):
+                return None  # Already covered by the raw selector
+            return page.get_by_text(selector)
+
+        if strategy == "role":
+            locator = None
+            for role in CLICKABLE_ROLES:
+                by_role = page.get_by_role(role, name=selector)
+                locator = by_role if locator is None else locator.or_(by_role)
+            return locator
+
+        if strategy == "element_map":
+            entry = self.element_map.get(selector.lower().strip())
+            if entry and entry.get("href"):
+                return page.locator(f'a[href="{entry["href"]}"]')
+            return None
+
+        raise ValueError(f"Unknown strategy: {strategy}")
+
+    def _cache_key(self, page, selector: str):
+        return (self.product_id, url_pattern(page.url), selector)
+
+    async def resolve(self, page, selector: str):
+        """
+        Returns:
+            (locator, strategy, from_cache)
+
+        Raises:
+            The last locator error if no strategy finds a visible element in time
+        """
+        started = time.perf_counter()
+        key = self._cache_key(page, selector)
+
+        strategy = self.cache.get(key)
+        if strategy:
+            locator = self._candidate(page, strategy, selector)
+            if locator is not None:
+                # A stale strategy must fail here, within timeout_ms, not in the action
+                try:
+                    await locator.first.wait_for(state="visible", timeout=self.timeout_ms)
+                except asyncio.CancelledError:
+                    self.cache.invalidate(key)
+                    raise
+                except Exception:
+                    logger.info(f"Cached '{strategy}' strategy no longer matches {selector!r}, re-resolving")
+                    self.cache.invalidate(key)
+                else:
+                    self.hits += 1
+                    self._record_latency(started)
+                    return locator.first, strategy, True
+
+        self.misses += 1
+        candidates = {}
+        for name in ("element_map", "css", "text", "role"):
+            locator = self._candidate(page, name, selector)
+            if locator is not None:
+                candidates[name] = locator.first
+
+        tasks = {
+            asyncio.create_task(locator.wait_for(state="visible", timeout=self.timeout_ms)): name
+            for name, locator in candidates.items()
+        }
+        strategy = None
+        error = None
+        pending = set(tasks)
+        try:
+            while pending and strategy is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    exception = task.exception()
+                    if exception is not None:
+                        error = exception
+                    elif strategy is None:
+                        strategy = tasks[task]
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if strategy is None:
+            self.failures += 1
+            raise error or LookupError(f"No element matches {selector!r}")
+
+        self.cache.put(key, strategy)
+        self.wins[strategy] = self.wins.get(strategy, 0) + 1
+        self._record_latency(started)
+        return candidates[strategy], strategy, False
+
+    def invalidate(self, page, selector: str):
+        """Drop a cached strategy that stopped working (e.g. the page changed)."""
+        self.cache.invalidate(self._cache_key(page, selector))
+
+    def _record_latency(self, started):
+        self.resolve_ms.append((time.perf_counter() - started) * 1000)
+        if len(self.resolve_ms) > 200:
+            self.resolve_ms.pop(0)
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "failures": self.failures,
+            "wins": dict(self.wins),
+            "avg_resolve_ms": sum(self.resolve_ms) / len(self.resolve_ms) if self.resolve_ms else None
+        }
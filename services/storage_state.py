@@ -0,0 +1,92 @@
+# Storage State Store - per-product Playwright login snapshots
+# Lets live sessions start already authenticated instead of logging in again
+
+import json
+import logging
+import os
+import re
+import time
+from config import config
+
+logger = logging.getLogger(__name__)
+
+class StorageStateStore:
+    """
+    Persists Playwright storage state (cookies + localStorage) per product on disk.
+    Snapshots expire after `ttl_seconds`; expired snapshots are treated as missing.
+    """
+
+    def __init__(self, directory: str, ttl_seconds: int = 12 * 3600):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+
+    def _path(self, product_id: str) -> str:
+        safe_id = re.sub(r"[^A-Za-z0-9_.-]", "_", product_id)
+        return os.path.join(self.directory, f"{safe_id}.json")
+
+    def save(self, product_id: str, state: dict, start_url: str = None):
+        """
+        Store a snapshot for a product.
+
+        Args:
+            product_id: Product the login belongs to
+            state: Result of BrowserContext.storage_state()
+            start_url: Page the authenticated session landed on
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        now = time.time()
+        entry = {
+            "product_id": product_id,
+            "saved_at": now,
+            "expires_at": now + self.ttl_seconds,
+            "start_url": start_url,
+            "state": state
+        }
+        path = self._path(product_id)
+        tmp_path = path + ".tmp"
+        # Session cookies are credentials: keep the file private to this user
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+        self.refreshes += 1
+        logger.info(f"Saved storage state for product {product_id}")
+
+    def load(self, product_id: str):
+        """
+        Return the snapshot entry ({"state", "start_url", ...}) or None if
+        there is none or it has expired.
+        """
+        try:
+            with open(self._path(product_id)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        if entry.get("expires_at", 0) < time.time():
+            logger.info(f"Storage state for product {product_id} expired")
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return entry
+
+    def delete(self, product_id: str):
+        try:
+            os.remove(self._path(product_id))
+        except OSError:
+            pass
+
+    def get_stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes
+        }
+
+# Global store instance
+storage_state_store = StorageStateStore(config.STORAGE_STATE_DIR, config.STORAGE_STATE_TTL)
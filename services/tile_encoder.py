@@ -0,0 +1,149 @@
+import io
+import logging
+import struct
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+TILES_HEADER = struct.Struct("!HHH")   # frame width, frame height, tile count
+TILE_HEADER = struct.Struct("!HHHHI")  # x, y, width, height, jpeg length
+
+class TileDiffEncoder:
+    """
+    Encodes a frame stream as dirty-region updates for one viewer.
+
+    Each frame is split into a grid; only tiles that changed since the last
+    encoded frame are re-encoded and sent with their coordinates. Runs of
+    adjacent dirty tiles in a row are merged into one rectangle. A full
+    keyframe (the original JPEG, untouched) is sent periodically, on resize,
+    or when most of the screen changed anyway.
+    """
+
+    def __init__(self, tile_size=64, keyframe_interval=60, pixel_tolerance=16,
+                 quality=70, max_dirty_ratio=0.5):
+        """
+        Args:
+            tile_size: Tile edge length in pixels
+            keyframe_interval: Send a full frame at least every N frames
+            pixel_tolerance: Per-channel delta (0-255) below which a pixel is unchanged
+            quality: JPEG quality for tile crops
+            max_dirty_ratio: Above this fraction of dirty tiles, send a keyframe instead
+        """
+        self.tile_size = tile_size
+        self.keyframe_interval = keyframe_interval
+        self.pixel_tolerance = pixel_tolerance
+        self.quality = quality
+        self.max_dirty_ratio = max_dirty_ratio
+        self.reference = None
+        self.frames_since_keyframe = 0
+        self.force_keyframe = True
+        self.keyframes_sent = 0
+        self.delta_frames_sent = 0
+        self.tiles_sent = 0
+        self.bytes_sent = 0
+        self.full_frame_bytes = 0
+
+    def request_keyframe(self):
+        """Make the next encode() a full frame (e.g. a viewer just (re)joined)."""
+        self.force_keyframe = True
+
+    def dirty_tiles(self, frame: np.ndarray) -> np.ndarray:
+        """Return a (rows, cols) bool grid of tiles that differ from the reference."""
+        ts = self.tile_size
+        height, width = frame.shape[:2]
+        rows, cols = -(-height // ts), -(-width // ts)
+
+        delta = np.abs(frame.astype(np.int16) - self.reference.astype(np.int16)).max(axis=2)
+        padded = np.zeros((rows * ts, cols * ts), dtype=delta.dtype)
+        padded[:height, :width] = delta
+        return padded.reshape(rows, ts, cols, ts).max(axis=(1, 3)) > self.pixel_tolerance
+
+    def _dirty_rects(self, dirty: np.ndarray, width: int, height: int):
+        """Merge horizontal runs of dirty tiles into (x, y, w, h) rectangles."""
+        ts = self.tile_size
+        rects = []
+        for row in np.flatnonzero(dirty.any(axis=1)):
+            # Run boundaries from the edges of the padded row mask
+            edges = np.flatnonzero(np.diff(np.concatenate(([0], dirty[row].astype(np.int8), [0]))))
+            for start, end in zip(edges[::2], edges[1::2]):
+                x, y = start * ts, row * ts
+                rects.append((x, y, min(end * ts, width) - x, min(ts, height - y)))
+        return rects
+
+    def encode(self, jpeg_bytes: bytes):
+        """
+        Encode the next frame.
+
+        Returns:
+            ("keyframe", jpeg_bytes), ("tiles", payload) or (None, None) if
+            nothing visible changed.
+        """
+        image = Image.open(io.BytesIO(jpeg_bytes)).convert("RGB")
+        frame = np.asarray(image)
+        height, width = frame.shape[:2]
+        self.full_frame_bytes += len(jpeg_bytes)
+
+        keyframe = (
+            self.force_keyframe
+            or self.reference is None
+            or self.reference.shape != frame.shape
+            or self.frames_since_keyframe >= self.keyframe_interval
+        )
+
+        if not keyframe:
+            dirty = self.dirty_tiles(frame)
+            if not dirty.any():
+                return None, None
+            keyframe = dirty.mean() > self.max_dirty_ratio
+
+        self.reference = frame
+        if keyframe:
+            self.force_keyframe = False
+            self.frames_since_keyframe = 0
+            self.keyframes_sent += 1
+            self.bytes_sent += len(jpeg_bytes)
+            return "keyframe", jpeg_bytes
+
+        rects = self._dirty_rects(dirty, width, height)
+        parts = [TILES_HEADER.pack(width, height, len(rects))]
+        for x, y, w, h in rects:
+            buffer = io.BytesIO()
+            image.crop((x, y, x + w, y + h)).save(buffer, format="JPEG", quality=self.quality)
+            tile = buffer.getvalue()
+            parts.append(TILE_HEADER.pack(x, y, w, h, len(tile)))
+            parts.append(tile)
+
+        payload = b"".join(parts)
+        self.frames_since_keyframe += 1
+        self.delta_frames_sent += 1
+        self.tiles_sent += len(rects)
+        self.bytes_sent += len(payload)
+        return "tiles", payload
+
+    def get_stats(self) -> dict:
+        return {
+            "keyframes_sent": self.keyframes_sent,
+            "delta_frames_sent": self.delta_frames_sent,
+            "tiles_sent": self.tiles_sent,
+            "bytes_sent": self.bytes_sent,
+            "full_frame_bytes": self.full_frame_bytes,
+            "egress_ratio": self.bytes_sent / self.full_frame_bytes if self.full_frame_bytes else 1.0
+        }
+
+def decode_tiles(payload: bytes):
+    """
+    Parse a tiles payload.
+
+    Returns:
+        (width, height, [(x, y, w, h, jpeg_bytes), ...])
+    """
+    width, height, count = TILES_HEADER.unpack_from(payload)
+    offset = TILES_HEADER.size
+    tiles = []
+    for _ in range(count):
+        x, y, w, h, length = TILE_HEADER.unpack_from(payload, offset)
+        offset += TILE_HEADER.size
+        tiles.append((x, y, w, h, bytes(payload[offset:offset + length])))
+        offset += length
+    return width, height, tiles
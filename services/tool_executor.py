@@ -0,0 +1,220 @@
+# Tool Executor - per-session ordering, deadlines and cancellation for tool calls
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Seconds a single call may take before it is abandoned, by action type
+DEFAULT_TIMEOUTS = {
+    "browser_action:goto": 30,
+    "browser_action:click": 10,
+    "browser_action:type": 10,
+    "browser_action:scroll": 5,
+    "browser_action:hover": 10,
+    "browser_macro": 60
+}
+
+class ToolCall:
+    def __init__(self, call_id, name, args, response_id=None):
+        self.call_id = call_id
+        self.name = name
+        self.args = args
+        self.response_id = response_id
+        self.kind = self._kind(name, args)
+        self.enqueued_at = time.perf_counter()
+
+    @staticmethod
+    def _kind(name, args):
+        if name != "browser_action":
+            return name
+        try:
+            return f"{name}:{json.loads(args).get('action')}"
+        except (ValueError, AttributeError):
+            return name
+
+class ToolExecutor:
+    """
+    Runs a session's tool calls.
+
+    - Calls run one at a time, in arrival order (every tool mutates the page)
+    - Every call has a deadline; a hung Playwright call is cancelled
+    - A call from a newer response cancels calls still queued from older
+      ones; they get a "cancelled" output without triggering a response
+    - When a response issues several calls, only the last output (after
+      response.done) asks for the next response, so the first result never
+      starts a response that would supersede its still-queued siblings
+    """
+
+    def __init__(self, handler, on_result, timeouts=None, default_timeout=30, request_response=None):
+        """
+        Args:
+            handler: async handler(name, args) -> result string
+            on_result: async on_result(call_id, result, trigger_response)
+            timeouts: Per-kind deadlines in seconds ("browser_action:click", "browser_macro", ...)
+            default_timeout: Deadline for kinds not listed in timeouts
+            request_response: request_response() asks the model for its next response;
+                without it every output triggers a response itself
+        """
+        self.handler = handler
+        self.on_result = on_result
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+        self.default_timeout = default_timeout
+        self.request_response = request_response
+        # response_id -> {"outstanding", "done", "cancelled", "needs_response"}
+        self.responses = {}
+        self.done_responses = deque(maxlen=32)  # response.done seen before the calls were submitted
+        self.queue = deque()
+        self.queue_ready = asyncio.Event()
+        self.running = None
+        self.latest_response_id = None
+        self.worker_task = None
+        self.background = set()
+
+        # Stats per kind: calls, timeouts, cancelled, wait and execution times
+        self.stats = {}
+
+    def is_idle(self) -> bool:
+        """True when no call is running or queued."""
+        return self.running is None and not self.queue
+
+    def submit(self, call_id, name, args, response_id=None):
+        call = ToolCall(call_id, name, args, response_id)
+        if response_id and response_id != self.latest_response_id:
+            if self.latest_response_id is not None:
+                self.cancel_pending(f"superseded by response {response_id}")
+            self.latest_response_id = response_id
+        if response_id:
+            entry = self.responses.setdefault(response_id, {
+                "outstanding": 0,
+                "done": response_id in self.done_responses,
+                "cancelled": False,
+                "needs_response": False
+            })
+            entry["outstanding"] += 1
+
+        self.queue.append(call)
+        self.queue_ready.set()
+        if not self.worker_task or self.worker_task.done():
+            self.worker_task = asyncio.create_task(self._worker_loop())
+        return call
+
+    def cancel_pending(self, reason="cancelled"):
+        """Drop every queued (not yet running) call."""
+        while self.queue:
+            call = self.queue.popleft()
+            self._record(call.kind, "cancelled")
+            logger.info(f"Cancelled queued tool call {call.call_id} ({call.kind}): {reason}")
+            self._finish(call, completed=False)
+            self._spawn(self.on_result(call.call_id, f"Cancelled: {reason}", False))
+
+    def reset(self, reason="connection lost"):
+        """
+        The Realtime session was re-established: responses from the old socket
+        never get response.done. Queued calls are cancelled, and a call still
+        running asks for a response itself once its output is in.
+        """
+        self.cancel_pending(reason)
+        self.responses.clear()
+        self.done_responses.clear()
+        self.latest_response_id = None
+
+    def response_done(self, response_id, status=None):
+        """response.done from the model: no more calls will come from this response."""
+        self.done_responses.append(response_id)
+        entry = self.responses.get(response_id)
+        if not entry:
+            return
+        entry["done"] = True
+        entry["cancelled"] = status == "cancelled"
+        if entry["outstanding"] == 0:
+            del self.responses[response_id]
+            if entry["needs_response"] and not entry["cancelled"] and self.request_response:
+                self.request_response()
+
+    def _finish(self, call, completed=True) -> bool:
+        """
+        Account for a finished call.
+
+        Returns:
+            True if its output should ask for the model's next response
+        """
+        if not self.request_response or call.response_id not in self.responses:
+            return completed
+        entry = self.responses[call.response_id]
+        entry["outstanding"] -= 1
+        entry["needs_response"] |= completed
+        if entry["outstanding"] or not entry["done"]:
+            return False
+        del self.responses[call.response_id]
+        return entry["needs_response"] and not entry["cancelled"]
+
+    def _spawn(self, coroutine):
+        task = asyncio.create_task(coroutine)
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+
+    async def _worker_loop(self):
+        while True:
+            await self.queue_ready.wait()
+            if not self.queue:
+                self.queue_ready.clear()
+                continue
+            self.running = self.queue.popleft()
+            try:
+                await self._execute(self.running)
+            finally:
+                self.running = None
+
+    async def _execute(self, call):
+        started = time.perf_counter()
+        self._record(call.kind, "wait_ms", (started - call.enqueued_at) * 1000)
+        timeout = self.timeouts.get(call.kind, self.default_timeout)
+        try:
+            result = await asyncio.wait_for(self.handler(call.name, call.args), timeout)
+        except asyncio.TimeoutError:
+            self._record(call.kind, "timeouts")
+            logger.warning(f"Tool call {call.call_id} ({call.kind}) timed out after {timeout}s")
+            result = f"Error executing {call.kind}: timed out after {timeout}s"
+        except Exception as e:
+            result = f"Error executing {call.kind}: {e}"
+        self._record(call.kind, "exec_ms", (time.perf_counter() - started) * 1000)
+        self._record(call.kind, "calls")
+        await self.on_result(call.call_id, result, self._finish(call))
+
+    def _record(self, kind, field, value=None):
+        entry = self.stats.setdefault(kind, {"calls": 0, "timeouts": 0, "cancelled": 0, "wait_ms": [], "exec_ms": []})
+        if value is None:
+            entry[field] += 1
+            return
+        entry[field].append(value)
+        if len(entry[field]) > 200:
+            entry[field].pop(0)
+
+    async def stop(self):
+        self.cancel_pending("session ended")
+        if self.worker_task:
+            self.worker_task.cancel()
+
+    def get_stats(self) -> dict:
+        def avg(values):
+            return sum(values) / len(values) if values else None
+        return {
+            "queued": len(self.queue),
+            "open_responses": len(self.responses),
+            "running": self.running.kind if self.running else None,
+            "by_kind": {
+                kind: {
+                    "calls": entry["calls"],
+                    "timeouts": entry["timeouts"],
+                    "cancelled": entry["cancelled"],
+                    "avg_wait_ms": avg(entry["wait_ms"]),
+                    "avg_exec_ms": avg(entry["exec_ms"]),
+                    "max_exec_ms": max(entry["exec_ms"]) if entry["exec_ms"] else None
+                }
+                for kind, entry in self.stats.items()
+            }
+        }
@@ -0,0 +1,194 @@
+# Tool Speculation - starts idempotent browser prep while tool arguments are still streaming
+# The final arguments confirm the head start or roll it back
+
+import asyncio
+import json
+import logging
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+# A complete top-level "key": "string value" pair (the closing quote has arrived)
+STRING_FIELD = re.compile(r'"(\w+)"\s*:\s*("(?:[^"\\]|\\.)*")')
+
+# Arguments the prep depends on; if any differ in the final call the prep is rolled back
+SPECULATED_FIELDS = ("action", "selector", "value")
+
+class PartialArguments:
+    """
+    Incremental parser for streamed function-call arguments.
+    Only string fields whose value is complete are reported.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self._scan_from = 0
+
+    def feed(self, delta: str) -> dict:
+        """Append a delta and return the fields completed by it."""
+        self.buffer += delta
+        completed = {}
+        for match in STRING_FIELD.finditer(self.buffer, self._scan_from):
+            key = match.group(1)
+            if key not in self.fields:
+                try:
+                    self.fields[key] = completed[key] = json.loads(match.group(2))
+                except ValueError:
+                    continue
+            self._scan_from = match.end()
+        return completed
+
+class Speculation:
+    def __init__(self, fields: dict, task):
+        self.fields = dict(fields)
+        self.task = task
+        self.started = time.perf_counter()
+        self.finished = None
+
+class ToolSpeculator:
+    """
+    Watches browser_action argument deltas and, once action and its target are
+    known, runs BrowserManager.prepare_action early (locator resolution or the
+    goto itself). confirm() compares the final arguments with what was used;
+    on_response_done() rolls back prep for calls that never completed (the
+    response was cancelled, e.g. by barge-in, or failed mid-arguments).
+    Rolling back a goto navigates the page back to where it was.
+    """
+
+    def __init__(self, browser_manager, is_idle=None):
+        """
+        Args:
+            browser_manager: Session BrowserManager
+            is_idle: Optional callable; prep only starts while it returns True,
+                so it never races a tool call that is already using the page
+        """
+        self.browser_manager = browser_manager
+        self.is_idle = is_idle
+        self.partials = {}  # call_id -> PartialArguments
+        self.speculations = {}  # call_id -> Speculation
+        self.call_responses = {}  # call_id -> response_id, for pruning unfinished calls
+
+        # Stats
+        self.started = 0
+        self.confirmed = 0
+        self.rolled_back = 0
+        self.failed = 0
+        self.abandoned = 0
+        self.saved_ms = []
+
+    def on_delta(self, call_id, name, delta, response_id=None):
+        if name != "browser_action" or call_id in self.speculations:
+            return
+        if response_id:
+            self.call_responses[call_id] = response_id
+        partial = self.partials.setdefault(call_id, PartialArguments())
+        partial.feed(delta)
+
+        fields = partial.fields
+        action = fields.get("action")
+        ready = (
+            (action in ("click", "type", "hover") and "selector" in fields)
+            or (action == "goto" and "value" in fields)
+        )
+        if not ready or (self.is_idle and not self.is_idle()):
+            return
+
+        task = asyncio.create_task(self.browser_manager.prepare_action(
+            action, fields.get("selector"), fields.get("value")
+        ))
+        speculation = Speculation(fields, task)
+        task.add_done_callback(lambda t: self._on_prepared(speculation, t))
+        self.speculations[call_id] = speculation
+        self.started += 1
+        logger.info(f"Speculatively preparing {action} for call {call_id}")
+
+    @staticmethod
+    def _on_prepared(speculation, task):
+        speculation.finished = time.perf_counter()
+        if not task.cancelled() and task.exception():
+            logger.debug(f"Speculative prep failed: {task.exception()}")
+
+    async def confirm(self, call_id, name, args):
+        """
+        Settle the speculation for a finished tool call before it executes.
+        Returns True if the head start matched the final arguments.
+        """
+        self.partials.pop(call_id, None)
+        self.call_responses.pop(call_id, None)
+        speculation = self.speculations.pop(call_id, None)
+        if not speculation:
+            return False
+
+        try:
+            final = json.loads(args) if name == "browser_action" else {}
+        except ValueError:
+            final = {}
+        matches = all(
+            final.get(key) == speculation.fields.get(key)
+            for key in SPECULATED_FIELDS if key in speculation.fields
+        )
+
+        if not matches:
+            self.rolled_back += 1
+            speculation.task.cancel()
+            # A different goto navigates away anyway; anything else needs the old page back
+            self.browser_manager.discard_speculation(restore=final.get("action") != "goto")
+            logger.info(f"Speculation for call {call_id} rolled back")
+            return False
+
+        # The work done before the final arguments arrived is the time saved
+        confirmed_at = time.perf_counter()
+        saved = (min(speculation.finished or confirmed_at, confirmed_at) - speculation.started) * 1000
+        self.confirmed += 1
+        self.saved_ms.append(saved)
+        if len(self.saved_ms) > 200:
+            self.saved_ms.pop(0)
+
+        if not speculation.task.done():
+            return True
+        if speculation.task.cancelled() or speculation.task.exception():
+            # The real action reports the error; a failed goto is retried by it
+            self.failed += 1
+            self.browser_manager.discard_speculation(restore=False)
+        return True
+
+    def on_response_done(self, response_id, status=None):
+        """
+        response.done: any call of this response not confirmed by now never
+        will be. Deferred one loop turn so tool-call tasks already scheduled
+        for this response settle their own speculation first.
+        """
+        asyncio.get_running_loop().call_soon(self._prune, response_id)
+
+    def _prune(self, response_id):
+        for call_id in [c for c, r in self.call_responses.items() if r == response_id]:
+            self._abandon(call_id, f"response {response_id} ended without it")
+
+    def reset(self):
+        """The Realtime session was re-established: no pending call will ever be confirmed."""
+        for call_id in set(self.speculations) | set(self.call_responses):
+            self._abandon(call_id, "the connection was lost")
+        self.partials.clear()
+
+    def _abandon(self, call_id, reason):
+        self.call_responses.pop(call_id, None)
+        self.partials.pop(call_id, None)
+        speculation = self.speculations.pop(call_id, None)
+        if speculation:
+            self.abandoned += 1
+            speculation.task.cancel()
+            self.browser_manager.discard_speculation()
+            logger.info(f"Speculation for call {call_id} abandoned: {reason}")
+
+    def get_stats(self) -> dict:
+        return {
+            "started": self.started,
+            "confirmed": self.confirmed,
+            "rolled_back": self.rolled_back,
+            "failed": self.failed,
+            "abandoned": self.abandoned,
+            "avg_saved_ms": sum(self.saved_ms) / len(self.saved_ms) if self.saved_ms else None,
+            "total_saved_ms": sum(self.saved_ms)
+        }
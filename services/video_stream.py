@@ -1,25 +1,312 @@
+import json
 import logging
 import asyncio
+import time
+from services import frame_protocol
+from services.frame_encoder import FrameEncoder, EncodeProfile, run_in_encoder
+from services.tile_encoder import TileDiffEncoder
 
 logger = logging.getLogger(__name__)
 
+class BroadcastFrame:
+    """
+    One bus frame, packaged once for every viewer.
+
+    Packets are built per protocol (binary keyframe, tile update, legacy
+    JSON), never per viewer. Tile updates only apply on top of base_seq;
+    after this frame the tile reference is ref_seq.
+    """
+
+    def __init__(self, frame, base_seq=None, ref_seq=None, tile_kind=None):
+        self.seq = frame.seq
+        self.timestamp = frame.timestamp
+        self.base_seq = base_seq
+        self.ref_seq = ref_seq if ref_seq is not None else frame.seq
+        self.tile_kind = tile_kind
+        self.tiled = False  # Ran through the shared tile encoder
+        self.packets = {}  # "frame" / "tiles" / "json" -> message
+
+class StreamViewer:
+    """
+    A single subscriber.
+
+    - Holds at most one pending frame; a newer frame replaces it (counted as dropped)
+    - Its own sender task paces sends to how fast this viewer drains: the
+      send interval follows a moving average of its send time, so a slow
+      link gets fewer frames instead of a growing backlog
+    """
+
+    def __init__(self, name, send, binary_frames=False, tiles=False,
+                 max_fps=30, min_fps=1, headroom=1.5, close=None):
+        """
+        Args:
+            name: Viewer name (e.g. "buyer", "watcher-...")
+            send: async send(message) for this viewer's connection
+            binary_frames: Send binary VIDEO_FRAME messages instead of JSON
+            tiles: Send dirty-region VIDEO_TILES updates (requires binary_frames)
+            max_fps / min_fps: Bounds of the adaptive frame rate
+            headroom: Interval = average send time * headroom
+            close: async close() for connections that only exist to watch this
+                stream; called when the stream stops
+        """
+        self.name = name
+        self.send = send
+        self.close = close
+        self.binary_frames = binary_frames
+        self.tiles = binary_frames and tiles
+        self.min_interval = 1 / max_fps
+        self.max_interval = 1 / min_fps
+        self.headroom = headroom
+        self.interval = self.min_interval
+        self.pending = None
+        self.ready = asyncio.Event()
+        self.synced_seq = None  # Tile reference this viewer holds, None forces a keyframe
+        self.task = None
+
+        # Stats
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.frames_skipped = 0  # Nothing visible changed for this viewer
+        self.bytes_sent = 0
+        self.send_errors = 0
+        self.avg_send_ms = None
+        self.last_seq = 0
+        self.lag_ms = []
+
+    def set_protocol(self, binary_frames=False, tiles=False):
+        self.binary_frames = binary_frames
+        self.tiles = binary_frames and tiles
+        self.synced_seq = None
+
+    def offer(self, frame: BroadcastFrame):
+        if self.pending is not None:
+            self.frames_dropped += 1
+        self.pending = frame
+        self.ready.set()
+
+    def is_current(self, frame: BroadcastFrame) -> bool:
+        """True if this viewer already shows the frame (nothing visible changed)."""
+        return self.tiles and frame.tiled and frame.tile_kind is None and self.synced_seq == frame.base_seq
+
+    def packet_for(self, frame: BroadcastFrame):
+        """
+        Returns:
+            The message for this viewer, or None if the frame was packaged
+            before this viewer switched protocol
+        """
+        if self.tiles and frame.tiled and frame.tile_kind == "tiles" and self.synced_seq == frame.base_seq:
+            return frame.packets.get("tiles")
+        return frame.packets.get("frame" if self.binary_frames else "json")
+
+    async def run(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+            frame, self.pending = self.pending, None
+            if frame is None:
+                continue
+
+            if self.is_current(frame):
+                self.frames_skipped += 1
+                self.synced_seq = frame.ref_seq
+                continue
+            packet = self.packet_for(frame)
+            if packet is None:
+                continue
+
+            started = time.perf_counter()
+            try:
+                await self.send(packet)
+            except Exception as e:
+                self.send_errors += 1
+                self.synced_seq = None
+                logger.debug(f"Viewer {self.name} send failed: {e}")
+                await asyncio.sleep(self.max_interval)
+                continue
+            elapsed = time.perf_counter() - started
+            self._record(frame, packet, elapsed)
+
+            # Pace the next send to this viewer's drain rate
+            await asyncio.sleep(max(0.0, self.interval - elapsed))
+
+    def _record(self, frame, packet, elapsed):
+        self.synced_seq = frame.ref_seq if self.tiles else None
+        self.frames_sent += 1
+        self.bytes_sent += len(packet)
+        self.last_seq = frame.seq
+        send_ms = elapsed * 1000
+        self.avg_send_ms = send_ms if self.avg_send_ms is None else 0.8 * self.avg_send_ms + 0.2 * send_ms
+        self.interval = min(self.max_interval, max(self.min_interval, self.avg_send_ms / 1000 * self.headroom))
+        self.lag_ms.append((time.time() - frame.timestamp) * 1000)
+        if len(self.lag_ms) > 100:
+            self.lag_ms.pop(0)
+
+    def get_stats(self, latest_seq=0) -> dict:
+        return {
+            "protocol": "tiles" if self.tiles else "binary" if self.binary_frames else "json",
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "frames_skipped": self.frames_skipped,
+            "frames_behind": max(0, latest_seq - self.last_seq),
+            "bytes_sent": self.bytes_sent,
+            "send_errors": self.send_errors,
+            "avg_send_ms": self.avg_send_ms,
+            "fps_cap": round(1 / self.interval, 1),
+            "avg_lag_ms": sum(self.lag_ms) / len(self.lag_ms) if self.lag_ms else None,
+            "max_lag_ms": max(self.lag_ms) if self.lag_ms else None
+        }
+
 class VideoStream:
-    def __init__(self):
+    """
+    Broadcasts the frame bus to any number of viewers (buyer, seller rep,
+    supervisor, ...).
+
+    Each frame is encoded and packaged once per protocol in use, whatever
+    the viewer count; handing it to a viewer is a pointer swap into its
+    latest-only slot. Tile updates come from one shared TileDiffEncoder;
+    viewers that missed the frame they were based on get a keyframe instead.
+    """
+
+    def __init__(self, frame_encoder=None, profile=None):
+        self.frame_encoder = frame_encoder or FrameEncoder()
+        self.profile = profile or EncodeProfile("viewer")
+        self.tile_encoder = None
+        self.tile_ref_seq = None  # Frame the shared tile encoder's reference was taken from
+        self.viewers = {}
+        self.latest = None
         self.is_streaming = False
+        self.subscription = None
+        self.stream_task = None
+        self.frames_streamed = 0
+        self.packets_built = 0
 
-    async def start(self):
-        logger.info("Starting Video Stream (Stub)...")
+    async def start(self, frame_bus=None):
+        logger.info("Starting Video Stream...")
         self.is_streaming = True
-        asyncio.create_task(self._stream_loop())
+        if frame_bus:
+            self.subscription = frame_bus.subscribe("video_stream")
+        self.stream_task = asyncio.create_task(self._stream_loop())
 
     async def stop(self):
         logger.info("Stopping Video Stream...")
         self.is_streaming = False
+        if self.stream_task:
+            self.stream_task.cancel()
+            self.stream_task = None
+        for name in list(self.viewers):
+            viewer = self.viewers[name]
+            self.unsubscribe(name)
+            if viewer.close:
+                try:
+                    await viewer.close()
+                except Exception as e:
+                    logger.debug(f"Closing viewer {name} failed: {e}")
+        if self.subscription:
+            self.subscription.close()
+            self.subscription = None
+
+    def subscribe(self, name, send, binary_frames=False, tiles=False, close=None) -> StreamViewer:
+        """
+        Add a viewer, or renegotiate the protocol of an existing one.
+
+        Args:
+            name: Unique viewer name within this stream
+            send: async send(message) for the viewer's connection
+            binary_frames: Binary VIDEO_FRAME messages instead of JSON
+            tiles: Dirty-region updates (requires binary_frames)
+            close: async close() called when the stream stops (watch-only connections)
+
+        Returns:
+            The StreamViewer
+        """
+        viewer = self.viewers.get(name)
+        if viewer:
+            viewer.set_protocol(binary_frames, tiles)
+        else:
+            viewer = StreamViewer(name, send, binary_frames, tiles, close=close)
+            viewer.task = asyncio.create_task(viewer.run())
+            self.viewers[name] = viewer
+            logger.info(f"Viewer {name} joined ({len(self.viewers)} watching)")
+        # Start from the current frame instead of waiting for the page to change
+        if self.latest:
+            viewer.offer(self.latest)
+        return viewer
+
+    def unsubscribe(self, name):
+        viewer = self.viewers.pop(name, None)
+        if viewer:
+            viewer.task.cancel()
+            logger.info(f"Viewer {name} left ({len(self.viewers)} watching)")
+
+    def request_keyframe(self, name):
+        """The viewer lost sync (e.g. dropped a tile update): resend the current frame in full."""
+        viewer = self.viewers.get(name)
+        if viewer:
+            viewer.synced_seq = None
+            if self.latest:
+                viewer.offer(self.latest)
 
     async def _stream_loop(self):
-        logger.info("Video Stream Loop Active (Stub)")
+        logger.info("Video Stream Loop Active")
         while self.is_streaming:
-            # In a real app, this would pick up frames from BrowserManager
-            # and send them to the WebRTC peer.
-            await asyncio.sleep(1)
-            # logger.debug("Sent frame...")
+            if not self.subscription:
+                await asyncio.sleep(1)
+                continue
+            frame = await self.subscription.get()
+            if not self.viewers:
+                continue
+            try:
+                self.latest = await self._package(frame)
+                self.frames_streamed += 1
+                for viewer in self.viewers.values():
+                    viewer.offer(self.latest)
+            except Exception as e:
+                logger.error(f"Video stream error: {e}")
+
+    async def _package(self, frame) -> BroadcastFrame:
+        """Build the packets the current viewers need, once each."""
+        viewers = list(self.viewers.values())
+        encoded = await self.frame_encoder.encode(frame, self.profile)
+        broadcast = BroadcastFrame(frame)
+
+        if any(viewer.tiles for viewer in viewers):
+            if not self.tile_encoder:
+                self.tile_encoder = TileDiffEncoder(quality=self.profile.quality)
+            kind, payload = await run_in_encoder(self.tile_encoder.encode, encoded.data)
+            broadcast.base_seq = self.tile_ref_seq
+            broadcast.tile_kind = kind
+            if kind is not None:
+                self.tile_ref_seq = frame.seq
+            broadcast.ref_seq = self.tile_ref_seq
+            if kind == "tiles":
+                self._add_packet(broadcast, "tiles", frame_protocol.encode_message(
+                    frame_protocol.VIDEO_TILES, frame.seq, payload, frame.timestamp
+                ))
+            broadcast.tiled = True
+
+        if any(viewer.binary_frames for viewer in viewers):
+            self._add_packet(broadcast, "frame", frame_protocol.encode_message(
+                frame_protocol.VIDEO_FRAME, frame.seq, encoded.data, frame.timestamp
+            ))
+        if any(not viewer.binary_frames for viewer in viewers):
+            # Legacy clients: base64 inside JSON
+            self._add_packet(broadcast, "json", json.dumps({
+                'type': 'video_frame',
+                'data': await self.frame_encoder.base64(encoded),
+                'timestamp': frame.timestamp
+            }))
+        return broadcast
+
+    def _add_packet(self, broadcast, kind, packet):
+        broadcast.packets[kind] = packet
+        self.packets_built += 1
+
+    def get_stats(self) -> dict:
+        latest_seq = self.latest.seq if self.latest else 0
+        return {
+            "viewers": len(self.viewers),
+            "frames_streamed": self.frames_streamed,
+            "packets_built": self.packets_built,
+            "tiles": self.tile_encoder.get_stats() if self.tile_encoder else None,
+            "by_viewer": {name: viewer.get_stats(latest_seq) for name, viewer in self.viewers.items()}
+        }
@@ -1,46 +1,77 @@
 # Vision Analyzer - Uses GPT-4o Vision to understand UI
 
+import asyncio
 import base64
+import hashlib
 import logging
 from openai import AsyncOpenAI
 from config import config
+from services.vision_cache import vision_cache, perceptual_hash
 
 logger = logging.getLogger(__name__)
 
+MODEL = "gpt-4o"
+SYSTEM_PROMPT = "You are a UI analyzer. Identify all interactive elements (buttons, links, forms) in the screenshot. Return a structured list."
+USER_PROMPT = "Analyze this UI and list all clickable elements with their purpose."
+MAX_TOKENS = 1000
+
+# Cached analyses are only reused for the exact prompt that produced them
+PROMPT_VERSION = hashlib.sha256(f"{MODEL}|{SYSTEM_PROMPT}|{USER_PROMPT}|{MAX_TOKENS}".encode("utf-8")).hexdigest()[:16]
+
 class VisionAnalyzer:
     """
     Analyzes screenshots using GPT-4o Vision.
     Identifies UI elements, describes functionality, suggests navigation.
     """
     
-    def __init__(self):
+    def __init__(self, cache=None):
+        """
+        Args:
+            cache: VisionCache for analyses (defaults to the shared one unless VISION_CACHE_MAX_MB is 0)
+        """
         self.client = AsyncOpenAI(
             api_key=config.AZURE_OPENAI_API_KEY,
             base_url=f"{config.AZURE_OPENAI_ENDPOINT}/openai/deployments/{config.AZURE_OPENAI_DEPLOYMENT}"
         )
+        self.cache = cache or (vision_cache if config.VISION_CACHE_MAX_MB > 0 else None)
+        self.vision_calls = 0
     
-    async def analyze_screenshot(self, screenshot_bytes: bytes) -> dict:
+    async def analyze_screenshot(self, screenshot_bytes: bytes, product_id: str = None) -> dict:
         """
         Analyze a screenshot and return structured data about UI elements.
+        Screens that look the same as one previously analyzed for the same
+        product come from the cache.
         """
+        scope = product_id or ""
+        image_hash = None
+        if self.cache:
+            try:
+                image_hash = await asyncio.to_thread(perceptual_hash, screenshot_bytes)
+                cached = await asyncio.to_thread(self.cache.get, image_hash, PROMPT_VERSION, scope)
+                if cached:
+                    logger.info("Vision analysis served from cache")
+                    return cached
+            except Exception as e:
+                logger.warning(f"Vision cache lookup failed: {e}")
+        
         try:
             # Convert to base64
             screenshot_base64 = base64.b64encode(screenshot_bytes).decode('utf-8')
             
             # Call GPT-4o Vision
             response = await self.client.chat.completions.create(
-                model="gpt-4o",
+                model=MODEL,
                 messages=[
                     {
                         "role": "system",
-                        "content": "You are a UI analyzer. Identify all interactive elements (buttons, links, forms) in the screenshot. Return a structured list."
+                        "content": SYSTEM_PROMPT
                     },
                     {
                         "role": "user",
                         "content": [
                             {
                                 "type": "text",
-                                "text": "Analyze this UI and list all clickable elements with their purpose."
+                                "text": USER_PROMPT
                             },
                             {
                                 "type": "image_url",
@@ -51,13 +82,14 @@ class VisionAnalyzer:
                         ]
                     }
                 ],
-                max_tokens=1000
+                max_tokens=MAX_TOKENS
             )
+            self.vision_calls += 1
             
             analysis = response.choices[0].message.content
             logger.info(f"Vision analysis: {analysis[:200]}...")
             
-            return {
+            result = {
                 "analysis": analysis,
                 "elements": []  # TODO: Parse structured elements
             }
@@ -65,6 +97,20 @@ class VisionAnalyzer:
         except Exception as e:
             logger.error(f"Vision analysis failed: {e}")
             return {"analysis": "", "elements": []}
+        
+        # Failed analyses are never cached
+        if image_hash:
+            try:
+                await asyncio.to_thread(self.cache.put, image_hash, PROMPT_VERSION, result, scope)
+            except Exception as e:
+                logger.warning(f"Vision cache store failed: {e}")
+        return result
+    
+    def get_stats(self) -> dict:
+        return {
+            "vision_calls": self.vision_calls,
+            "cache": self.cache.get_stats() if self.cache else None
+        }
     
     async def tag_elements(self, elements: list, screenshot_bytes: bytes) -> list:
         """
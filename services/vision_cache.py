@@ -0,0 +1,222 @@
+# Vision Cache - reuses screenshot analyses across crawls of the same product
+# Keyed by product, the analyzer's prompt version and a perceptual hash of the screenshot
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import numpy as np
+from config import config
+from services.frame_diff import luma_fingerprint
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 16                    # dHash grid edge: HASH_SIZE**2 = 256 bits
+BAND_BYTES = 2                    # Lookup bands of 16 bits
+BANDS = HASH_SIZE * HASH_SIZE // 8 // BAND_BYTES
+SCHEMA_VERSION = 2                # Bumped when the tables change; older caches are dropped
+
+def perceptual_hash(jpeg_bytes: bytes) -> bytes:
+    """
+    Difference hash (dHash) of a screenshot: one bit per neighbouring pair of
+    cells in a small luma thumbnail, set when brightness increases left to
+    right. Re-encoding, JPEG noise and tiny rendering differences flip few bits.
+
+    Returns:
+        HASH_SIZE**2 / 8 bytes
+    """
+    fingerprint = luma_fingerprint(jpeg_bytes, size=(HASH_SIZE + 1, HASH_SIZE))
+    return np.packbits(fingerprint[:, 1:] > fingerprint[:, :-1]).tobytes()
+
+def hamming_distance(a: bytes, b: bytes) -> int:
+    return int(np.unpackbits(np.bitwise_xor(np.frombuffer(a, np.uint8), np.frombuffer(b, np.uint8))).sum())
+
+def hash_bands(image_hash: bytes):
+    """Split a hash into BANDS integers. Hashes within BANDS - 1 bits share at least one band."""
+    return [int.from_bytes(image_hash[i:i + BAND_BYTES], "big") for i in range(0, len(image_hash), BAND_BYTES)]
+
+class VisionCache:
+    """
+    SQLite store of vision analyses.
+
+    - Exact hash hits first, then the closest stored hash within
+      max_distance bits (candidates come from the band index, so lookups
+      never scan the whole table)
+    - Entries are per product and prompt version: one seller's analysis is
+      never served for another seller's look-alike page, and changing the
+      prompt misses cleanly
+    - Least recently used entries are evicted once stored results exceed max_bytes
+    """
+
+    def __init__(self, path: str, max_bytes: int, max_distance: int = 8):
+        """
+        Args:
+            path: SQLite database file
+            max_bytes: Size of stored results before eviction kicks in
+            max_distance: Hamming distance (bits) still treated as the same screen, 0 for exact only
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_distance = min(max_distance, BANDS - 1)
+        self.db = None
+        self.lock = threading.Lock()
+        self.size_bytes = None
+
+        # Stats
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self):
+        if self.db is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self.db = sqlite3.connect(self.path, check_same_thread=False)
+            if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+                self.db.executescript(f"""
+                    DROP TABLE IF EXISTS analyses;
+                    DROP TABLE IF EXISTS bands;
+                    PRAGMA user_version = {SCHEMA_VERSION};
+                """)
+            self.db.executescript("""
+                CREATE TABLE IF NOT EXISTS analyses (
+                    scope TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    hash BLOB NOT NULL,
+                    result TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (scope, prompt_version, hash)
+                );
+                CREATE INDEX IF NOT EXISTS analyses_last_used ON analyses (last_used);
+                CREATE TABLE IF NOT EXISTS bands (
+                    scope TEXT NOT NULL,
+                    prompt_version TEXT NOT NULL,
+                    band INTEGER NOT NULL,
+                    value INTEGER NOT NULL,
+                    hash BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS bands_lookup ON bands (scope, prompt_version, band, value);
+            """)
+            self.size_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM analyses").fetchone()[0]
+        return self.db
+
+    def get(self, image_hash: bytes, prompt_version: str, scope: str = ""):
+        """
+        Return the cached analysis for this screen, else None. Blocking I/O.
+
+        Args:
+            scope: Product (tenant) the screenshot belongs to; lookups never cross scopes
+        """
+        key = (scope, prompt_version)
+        with self.lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT result FROM analyses WHERE scope = ? AND prompt_version = ? AND hash = ?", (*key, image_hash)
+            ).fetchone()
+            match = image_hash if row else None
+
+            if not row and self.max_distance:
+                match = self._nearest(db, image_hash, key)
+                if match:
+                    row = db.execute(
+                        "SELECT result FROM analyses WHERE scope = ? AND prompt_version = ? AND hash = ?", (*key, match)
+                    ).fetchone()
+
+            if not row:
+                self.misses += 1
+                return None
+
+            if match == image_hash:
+                self.exact_hits += 1
+            else:
+                self.near_hits += 1
+            with db:
+                db.execute(
+                    "UPDATE analyses SET last_used = ? WHERE scope = ? AND prompt_version = ? AND hash = ?",
+                    (time.time(), *key, match)
+                )
+            return json.loads(row[0])
+
+    def _nearest(self, db, image_hash, key):
+        clauses = " OR ".join(["(band = ? AND value = ?)"] * BANDS)
+        params = list(key)
+        for band, value in enumerate(hash_bands(image_hash)):
+            params += [band, value]
+        candidates = db.execute(
+            f"SELECT DISTINCT hash FROM bands WHERE scope = ? AND prompt_version = ? AND ({clauses})", params
+        ).fetchall()
+
+        best, best_distance = None, self.max_distance + 1
+        for (candidate,) in candidates:
+            distance = hamming_distance(image_hash, candidate)
+            if distance < best_distance:
+                best, best_distance = candidate, distance
+        return best
+
+    def put(self, image_hash: bytes, prompt_version: str, result: dict, scope: str = ""):
+        """Store an analysis under a product scope. Blocking I/O."""
+        key = (scope, prompt_version)
+        payload = json.dumps(result)
+        with self.lock:
+            db = self._connect()
+            with db:
+                previous = db.execute(
+                    "SELECT size FROM analyses WHERE scope = ? AND prompt_version = ? AND hash = ?", (*key, image_hash)
+                ).fetchone()
+                if previous:
+                    self.size_bytes -= previous[0]
+                else:
+                    db.executemany(
+                        "INSERT INTO bands (scope, prompt_version, band, value, hash) VALUES (?, ?, ?, ?, ?)",
+                        [(*key, band, value, image_hash) for band, value in enumerate(hash_bands(image_hash))]
+                    )
+                db.execute(
+                    "INSERT OR REPLACE INTO analyses (scope, prompt_version, hash, result, size, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, image_hash, payload, len(payload), time.time())
+                )
+            self.size_bytes += len(payload)
+            if self.size_bytes > self.max_bytes:
+                self._evict(db)
+
+    def _evict(self, db):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes."""
+        target = int(self.max_bytes * 0.9)
+        with db:
+            for scope, prompt_version, image_hash, size in db.execute(
+                "SELECT scope, prompt_version, hash, size FROM analyses ORDER BY last_used"
+            ).fetchall():
+                if self.size_bytes <= target:
+                    break
+                key = (scope, prompt_version, image_hash)
+                db.execute("DELETE FROM analyses WHERE scope = ? AND prompt_version = ? AND hash = ?", key)
+                db.execute("DELETE FROM bands WHERE scope = ? AND prompt_version = ? AND hash = ?", key)
+                self.size_bytes -= size
+                self.evictions += 1
+
+    def close(self):
+        with self.lock:
+            if self.db:
+                self.db.close()
+                self.db = None
+
+    def get_stats(self) -> dict:
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size_bytes": self.size_bytes
+        }
+
+vision_cache = VisionCache(
+    config.VISION_CACHE_PATH,
+    config.VISION_CACHE_MAX_MB * 1024 * 1024,
+    max_distance=config.VISION_CACHE_MAX_DISTANCE
+)
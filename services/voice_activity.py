@@ -0,0 +1,151 @@
+# Voice Activity Detection - drops silent microphone frames before they are uploaded
+# Energy + zero-crossing rate per 10 ms window, vectorized with NumPy
+
+import logging
+from collections import deque
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class VoiceActivityDetector:
+    """
+    Gate between audio capture and upload (mono PCM16).
+
+    - A 10 ms window is speech when its energy clears an adaptive noise floor
+      and its zero-crossing rate is voice-like (very loud windows always count)
+    - The floor is seeded from the first calibration_ms of audio and also
+      follows the minimum window energy of the last noise_window_ms, so
+      steady room noise cannot hold the gate open
+    - hangover_ms keeps the gate open after speech so trailing words and the
+      silence the server's turn detection needs still go out
+    - preroll_ms of audio from before speech onset is sent with the first frame
+    - on_speech_start / on_speech_stop fire locally
+    - on_sustained_speech fires once per segment after sustained_ms of voiced
+      audio (gaps up to max_gap_ms allowed), so a click or mic pop that opens
+      the gate does not count as the buyer talking (e.g. for barge-in)
+    """
+
+    def __init__(self, sample_rate=24000, hangover_ms=600, preroll_ms=200, margin_db=12.0,
+                 min_speech_db=-50.0, max_zcr=0.35, calibration_ms=500, noise_window_ms=3000,
+                 sustained_ms=200, max_gap_ms=80, on_speech_start=None, on_speech_stop=None,
+                 on_sustained_speech=None):
+        self.sample_rate = sample_rate
+        self.window = sample_rate // 100  # 10 ms
+        self.hangover_ms = hangover_ms
+        self.preroll_ms = preroll_ms
+        self.margin_db = margin_db
+        self.min_speech_db = min_speech_db
+        self.max_zcr = max_zcr
+        self.on_speech_start = on_speech_start
+        self.on_speech_stop = on_speech_stop
+        self.sustained_ms = sustained_ms
+        self.max_gap_ms = max_gap_ms
+        self.on_sustained_speech = on_sustained_speech
+
+        self.noise_floor_db = -60.0
+        self.calibration_windows = calibration_ms // 10
+        self.windows_seen = 0
+        # Minimum statistics: speech has pauses, so the quietest recent windows are the room
+        self.recent_energy_db = deque(maxlen=noise_window_ms // 10)
+        self.speaking = False
+        self.silence_ms = 0.0
+        self.voiced_ms = 0.0  # Voiced audio in the current run, for on_sustained_speech
+        self.sustained = False
+        self.preroll = deque()
+        self.preroll_total_ms = 0.0
+
+        # Stats
+        self.ms_in = 0.0
+        self.ms_sent = 0.0
+        self.speech_segments = 0
+        self.sustained_segments = 0
+
+    def is_speech(self, frame: bytes) -> bool:
+        samples = np.frombuffer(frame, dtype=np.int16)
+        windows = len(samples) // self.window
+        if windows == 0:
+            return False
+        x = samples[:windows * self.window].reshape(windows, self.window).astype(np.float32) / 32768.0
+
+        energy_db = 10 * np.log10(np.mean(x * x, axis=1) + 1e-10)
+        zcr = np.mean(np.signbit(x[:, 1:]) != np.signbit(x[:, :-1]), axis=1)
+
+        self.recent_energy_db.extend(energy_db.tolist())
+        self.windows_seen += windows
+        recent_min_db = min(self.recent_energy_db)
+        if self.windows_seen <= self.calibration_windows:
+            self.noise_floor_db = recent_min_db
+
+        threshold = max(self.min_speech_db, self.noise_floor_db + self.margin_db)
+        voiced = (energy_db > threshold) & ((zcr < self.max_zcr) | (energy_db > threshold + 10))
+        speech = np.count_nonzero(voiced) >= max(1, windows // 4)
+
+        if not speech:
+            self.noise_floor_db = 0.95 * self.noise_floor_db + 0.05 * float(np.median(energy_db))
+        elif recent_min_db > self.noise_floor_db:
+            # Slowly rise to the recent minimum, even while the gate is open
+            self.noise_floor_db += 0.05 * (recent_min_db - self.noise_floor_db)
+        return speech
+
+    def process(self, frame: bytes) -> list:
+        """
+        Returns:
+            The frames to upload for this input frame (empty while silent)
+        """
+        duration_ms = len(frame) / 2 / self.sample_rate * 1000
+        self.ms_in += duration_ms
+
+        if self.is_speech(frame):
+            self.silence_ms = 0.0
+            self.voiced_ms += duration_ms
+            onset = not self.speaking
+            if onset:
+                self.speaking = True
+                self.sustained = False
+                self.speech_segments += 1
+                logger.debug("Speech started")
+                if self.on_speech_start:
+                    self.on_speech_start()
+            if not self.sustained and self.voiced_ms >= self.sustained_ms:
+                self.sustained = True
+                self.sustained_segments += 1
+                if self.on_sustained_speech:
+                    self.on_sustained_speech()
+            if onset:
+                out = list(self.preroll) + [frame]
+                self.ms_sent += self.preroll_total_ms + duration_ms
+                self.preroll.clear()
+                self.preroll_total_ms = 0.0
+                return out
+        elif self.speaking:
+            self.silence_ms += duration_ms
+            if self.silence_ms > self.max_gap_ms:
+                self.voiced_ms = 0.0
+            if self.silence_ms > self.hangover_ms:
+                self.speaking = False
+                self.voiced_ms = 0.0
+                logger.debug("Speech stopped")
+                if self.on_speech_stop:
+                    self.on_speech_stop()
+
+        if self.speaking:
+            self.ms_sent += duration_ms
+            return [frame]
+
+        self.preroll.append(frame)
+        self.preroll_total_ms += duration_ms
+        while self.preroll and self.preroll_total_ms - len(self.preroll[0]) / 2 / self.sample_rate * 1000 >= self.preroll_ms:
+            dropped = self.preroll.popleft()
+            self.preroll_total_ms -= len(dropped) / 2 / self.sample_rate * 1000
+        return []
+
+    def get_stats(self) -> dict:
+        return {
+            "speaking": self.speaking,
+            "speech_segments": self.speech_segments,
+            "sustained_segments": self.sustained_segments,
+            "noise_floor_db": round(self.noise_floor_db, 1),
+            "audio_ms": round(self.ms_in),
+            "sent_ms": round(self.ms_sent),
+            "suppressed_percent": (1 - self.ms_sent / self.ms_in) * 100 if self.ms_in else 0.0
+        }
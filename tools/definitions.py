@@ -22,5 +22,58 @@ tools = [
             },
             "required": ["action", "selector"]
         }
+    },
+    {
+        "type": "function",
+        "name": "browser_macro",
+        "description": "Run several browser steps in one call, e.g. fill a form and submit it. Steps run in order and stop at the first failure. Prefer this over repeated browser_action calls when the next steps are already known.",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "steps": {
+                    "type": "array",
+                    "description": "Ordered browser steps.",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "action": {
+                                "type": "string",
+                                "enum": ["click", "type", "scroll", "goto", "hover"],
+                                "description": "The browser interaction for this step."
+                            },
+                            "selector": {
+                                "type": "string",
+                                "description": "The CSS selector or text description of the element."
+                            },
+                            "value": {
+                                "type": "string",
+                                "description": "The text to type or URL to visit."
+                            },
+                            "wait_for": {
+                                "type": "object",
+                                "description": "Optional condition to wait for after the step.",
+                                "properties": {
+                                    "type": {
+                                        "type": "string",
+                                        "enum": ["selector", "load_state", "url", "timeout"]
+                                    },
+                                    "value": {
+                                        "type": "string",
+                                        "description": "Selector, load state ('load', 'domcontentloaded', 'networkidle'), URL glob, or milliseconds."
+                                    }
+                                },
+                                "required": ["type"]
+                            }
+                        },
+                        "required": ["action"]
+                    }
+                },
+                "stop_on_error": {
+                    "type": "boolean",
+                    "description": "Stop at the first failing step (default true)."
+                }
+            },
+            "required": ["steps"]
+        }
     }
 ]
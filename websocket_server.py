@@ -1,8 +1,15 @@
 import asyncio
+import base64
 import websockets
 import json
 import logging
+import secrets
+from urllib.parse import urlparse, parse_qs
 from orchestrator import Orchestrator
+from services import frame_protocol
+from services.browser_pool import browser_pool
+from services.realtime_pool import realtime_pool
+from services.database import db
 
 logger = logging.getLogger(__name__)
 
@@ -16,17 +23,37 @@ class WebSocketServer:
         self.host = host
         self.port = port
         self.active_sessions = {}
+        self.watch_tokens = {}  # Unguessable watch token -> session_id
     
     async def handle_client(self, websocket):
         session_id = id(websocket)
         logger.info(f"New client connected: {session_id}")
         
         try:
+            # ?watch=<watch_token> joins a running demo as an extra viewer
+            watch_token = self._query_param(websocket, 'watch')
+            if watch_token:
+                await self.handle_watcher(websocket, watch_token)
+                return
+            
+            # Optional ?product_id=... selects the trained product to demo
+            product_id = self._query_param(websocket, 'product_id')
+            product = await db.get_product(product_id) if product_id else None
+            
             # Create a new orchestrator instance for this session
-            orchestrator = Orchestrator(websocket=websocket)
+            orchestrator = Orchestrator(
+                websocket=websocket,
+                browser_pool=browser_pool if browser_pool.is_running else None,
+                realtime_pool=realtime_pool if realtime_pool.is_running else None,
+                product=product
+            )
+            # Only the buyer's client learns this (hello_ack) and can share it
+            watch_token = secrets.token_urlsafe(24)
+            self.watch_tokens[watch_token] = session_id
             self.active_sessions[session_id] = {
                 'websocket': websocket,
-                'orchestrator': orchestrator
+                'orchestrator': orchestrator,
+                'watch_token': watch_token
             }
             
             # Start the orchestrator in background
@@ -34,28 +61,137 @@ class WebSocketServer:
             
             # Listen for messages from frontend
             async for message in websocket:
+                if isinstance(message, bytes):
+                    # Binary messages are media only: microphone audio once negotiated
+                    try:
+                        msg_type, _, _, _, payload = frame_protocol.decode_message(message)
+                    except ValueError as e:
+                        logger.warning(f"Dropping malformed binary message: {e}")
+                        continue
+                    if msg_type == frame_protocol.AUDIO_INPUT and orchestrator.audio_bridge:
+                        orchestrator.audio_bridge.push_input(payload)
+                    continue
+                
                 data = json.loads(message)
                 
-                if data['type'] == 'audio_input':
-                    # Forward audio to Realtime API
-                    # This would require audio handling in realtime_client
-                    pass
+                if data['type'] == 'hello':
+                    # Protocol negotiation; clients that never say hello get JSON frames
+                    viewer = orchestrator.set_viewer_protocol(
+                        binary_frames=bool(data.get('binary_frames')),
+                        tiles=bool(data.get('tiles'))
+                    )
+                    if data.get('audio'):
+                        orchestrator.enable_audio_bridge(int(data.get('audio_sample_rate') or 24000))
+                    await websocket.send(json.dumps({
+                        'type': 'hello_ack',
+                        'protocol_version': frame_protocol.PROTOCOL_VERSION,
+                        'watch_token': watch_token,
+                        'binary_frames': viewer.binary_frames,
+                        'tiles': viewer.tiles,
+                        'audio': orchestrator.audio_bridge is not None
+                    }))
+                
+                elif data['type'] == 'keyframe_request':
+                    # Viewer lost sync (e.g. dropped a tile update); resend a full frame
+                    orchestrator.video_stream.request_keyframe('buyer')
+                
+                elif data['type'] == 'audio_start':
+                    # Sent after the hello once the microphone permission prompt is answered
+                    orchestrator.enable_audio_bridge(int(data.get('sample_rate') or 24000))
+                    await websocket.send(json.dumps({'type': 'audio_ack', 'audio': True}))
+                
+                elif data['type'] == 'audio_input':
+                    # JSON fallback for clients without binary frames: base64 PCM16
+                    if orchestrator.audio_bridge:
+                        orchestrator.audio_bridge.push_input(base64.b64decode(data['audio']))
                 
                 elif data['type'] == 'text_input':
                     # Send text message to AI
                     text = data['text']
                     # orchestrator.send_text(text)
                     pass
+                
+                elif data['type'] == 'get_stats':
+                    stats = orchestrator.get_stats()
+                    if browser_pool.is_running:
+                        stats['browser_pool'] = browser_pool.get_stats()
+                    if realtime_pool.is_running:
+                        stats['realtime_pool'] = realtime_pool.get_stats()
+                    await websocket.send(json.dumps({
+                        'type': 'stats',
+                        'data': stats
+                    }))
             
         except websockets.exceptions.ConnectionClosed:
             logger.info(f"Client disconnected: {session_id}")
         finally:
             if session_id in self.active_sessions:
-                await self.active_sessions[session_id]['orchestrator'].stop()
-                del self.active_sessions[session_id]
+                session = self.active_sessions.pop(session_id)
+                self.watch_tokens.pop(session['watch_token'], None)
+                await session['orchestrator'].stop()
+    
+    async def handle_watcher(self, websocket, watch_token):
+        """
+        Extra viewer (seller rep, supervisor) of a running session: video
+        only, no control over the browser or the agent. Closed when the
+        session ends.
+        """
+        session = self.active_sessions.get(self.watch_tokens.get(watch_token))
+        if not session:
+            await websocket.close(code=4403, reason='Invalid watch token')
+            return
+        
+        video_stream = session['orchestrator'].video_stream
+        name = f"watcher-{id(websocket)}"
+        video_stream.subscribe(name, websocket.send, close=websocket.close)
+        try:
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    continue
+                data = json.loads(message)
+                
+                if data['type'] == 'hello':
+                    viewer = video_stream.subscribe(
+                        name, websocket.send,
+                        binary_frames=bool(data.get('binary_frames')),
+                        tiles=bool(data.get('tiles')),
+                        close=websocket.close
+                    )
+                    await websocket.send(json.dumps({
+                        'type': 'hello_ack',
+                        'protocol_version': frame_protocol.PROTOCOL_VERSION,
+                        'binary_frames': viewer.binary_frames,
+                        'tiles': viewer.tiles,
+                        'audio': False
+                    }))
+                
+                elif data['type'] == 'keyframe_request':
+                    video_stream.request_keyframe(name)
+                
+                elif data['type'] == 'get_stats':
+                    await websocket.send(json.dumps({
+                        'type': 'stats',
+                        'data': {'video': video_stream.get_stats()}
+                    }))
+        except websockets.exceptions.ConnectionClosed:
+            logger.info(f"Watcher disconnected: {name}")
+        finally:
+            video_stream.unsubscribe(name)
+    
+    @staticmethod
+    def _query_param(websocket, name):
+        # websockets >= 13 exposes the handshake as .request, older versions as .path
+        request = getattr(websocket, 'request', None)
+        path = request.path if request else getattr(websocket, 'path', '')
+        values = parse_qs(urlparse(path).query).get(name)
+        return values[0] if values else None
     
     async def start(self):
         logger.info(f"Starting WebSocket server on {self.host}:{self.port}")
+        if browser_pool.size > 0:
+            await browser_pool.start()
+        if realtime_pool.size > 0:
+            await realtime_pool.start()
         async with websockets.serve(self.handle_client, self.host, self.port):
             await asyncio.Future()  # Run forever
 